@@ -0,0 +1,122 @@
+"""
+Benchmark of the columnar cache of the pricing dataset against pd.read_csv.
+
+The pricing CSV is replicated to the requested number of rows in a temporary
+directory, then each loader runs in its own process, so that its peak memory is
+not hidden by the previous ones:
+
+- read_csv: pd.read_csv with the infered dtypes, as the API did before the cache
+- read_csv_typed: pd.read_csv with PRICING_DTYPES
+- cache_build: first load_pricing_dataset, parses the CSV and writes the cache
+- cache_load: later load_pricing_dataset, memory-maps the cache
+
+Run from the api directory:
+
+    python -m benchmarks.dataset_cache_benchmark --rows 2000000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+DEFAULT_DATASET_PATH = "src/data/get_around_pricing_project.csv"
+
+LOADERS = ("read_csv", "read_csv_typed", "cache_build", "cache_load")
+
+
+def replicate(dataset_path: str, rows: int, path: str):
+    """
+    Write the dataset repeated up to `rows` rows.
+    """
+    dataset = pd.read_csv(dataset_path)
+    repeats = -(-rows // len(dataset))
+    pd.concat([dataset] * repeats, ignore_index=True).iloc[:rows].to_csv(
+        path, index=False
+    )
+
+
+def _measure(loader: str, csv_path: str, cache_dir: str, results):
+    from src.services.pricing_data import PRICING_DTYPES, load_pricing_dataset
+
+    if loader == "cache_build":
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if loader == "read_csv":
+        frame = pd.read_csv(csv_path)
+    elif loader == "read_csv_typed":
+        frame = pd.read_csv(csv_path, dtype=PRICING_DTYPES)
+    else:
+        frame = load_pricing_dataset(csv_path, cache_dir)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results.put(
+        {
+            "seconds": seconds,
+            "peak_rss_mb": (peak_kb - baseline_kb) / 1024,
+            "frame_mb": frame.memory_usage(deep=True).sum() / 1024**2,
+        }
+    )
+
+
+def measure(loader: str, csv_path: str, cache_dir: str) -> dict:
+    """
+    Load the dataset in a fresh process.
+
+    Returns:
+        dict: Load time, peak RSS increase during the load and deep memory usage
+        of the frame.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_measure, args=(loader, csv_path, cache_dir, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "pricing.csv")
+        cache_dir = os.path.join(directory, "cache")
+        replicate(args.dataset, args.rows, csv_path)
+
+        report = {
+            "rows": args.rows,
+            "csv_mb": os.path.getsize(csv_path) / 1024**2,
+            "loaders": {},
+        }
+        for loader in LOADERS:
+            # Best time of the runs, the cache is rebuilt by each cache_build run
+            runs = [measure(loader, csv_path, cache_dir) for _ in range(args.repeat)]
+            report["loaders"][loader] = min(runs, key=lambda run: run["seconds"])
+        report["cache_mb"] = (
+            os.path.getsize(os.path.join(cache_dir, "pricing.csv.arrow")) / 1024**2
+        )
+
+    reference = report["loaders"]["read_csv"]["seconds"]
+    for result in report["loaders"].values():
+        result["speedup"] = reference / result["seconds"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Load benchmark of the getaround API.
+
+The app runs in-process with its lifespan, behind an httpx ASGI transport, and
+serves a stub linear model written to a temporary flat artifact, so neither the
+network nor MLflow are part of the measure. Payloads are cars drawn from the
+pricing CSV. Run from the api directory:
+
+    python -m benchmarks.load_benchmark --requests 2000 --concurrency 32 --output bench.json
+
+With --baseline, the report also holds the relative change of the RPS and of the
+latency percentiles of each endpoint against the report of a previous commit.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DATASET_PATH = "src/data/get_around_pricing_project.csv"
+
+# (method, url, json body) of one request
+Request = Tuple[str, str, object]
+
+
+def write_stub_artifact(dataset: pd.DataFrame, path: str):
+    """
+    Write a flat artifact predicting the mean price of the dataset for every car.
+
+    It has the categories of the dataset, so the requests go through the whole
+    encoding and one-hot transform of the served pipeline.
+    """
+    from src.services.feature_encoder import (
+        BOOLEAN_FEATURES,
+        CATEGORICAL_FEATURES,
+        NUMERIC_FEATURES,
+    )
+    from src.services.flat_pipeline import ARTIFACT_FORMAT_VERSION
+
+    numeric_features = NUMERIC_FEATURES + BOOLEAN_FEATURES
+    arrays = {
+        "format_version": np.array(ARTIFACT_FORMAT_VERSION),
+        "numeric_features": np.array(numeric_features, dtype=str),
+        "scaler_mean": np.zeros(len(numeric_features)),
+        "scaler_scale": np.ones(len(numeric_features)),
+        "categorical_features": np.array(CATEGORICAL_FEATURES, dtype=str),
+        "kind": np.array("linear"),
+        "intercept": np.array(float(dataset["rental_price_per_day"].mean())),
+    }
+    n_categories = 0
+    for i, feature in enumerate(CATEGORICAL_FEATURES):
+        categories = np.unique(dataset[feature].astype(str).str.lower()).astype(str)
+        arrays[f"categories_{i}"] = categories
+        n_categories += len(categories)
+    arrays["coef"] = np.zeros(len(numeric_features) + n_categories)
+    np.savez(path, **arrays)
+
+
+def build_scenarios(
+    dataset: pd.DataFrame, n_requests: int, seed: int
+) -> Dict[str, List[Request]]:
+    """
+    Requests of each benchmarked endpoint, drawn from the dataset.
+    """
+    from src.services.feature_encoder import FEATURES
+
+    rng = np.random.default_rng(seed)
+    rows = dataset.iloc[rng.integers(len(dataset), size=n_requests)]
+    # Native Python values, as a client would send them
+    cars = json.loads(rows[FEATURES].to_json(orient="records"))
+    columns = rng.choice(list(dataset.columns), size=n_requests)
+    counts = rng.integers(1, 50, size=n_requests)
+    return {
+        "/getaround/predict": [("POST", "/getaround/predict", car) for car in cars],
+        "/getaround/sample": [
+            ("GET", f"/getaround/sample?count={count}", None) for count in counts
+        ],
+        "/getaround/unique-values": [
+            ("GET", f"/getaround/unique-values?column={column}", None)
+            for column in columns
+        ],
+    }
+
+
+async def run_scenario(
+    send: Callable, requests: List[Request], concurrency: int
+) -> dict:
+    """
+    Replay the requests with `concurrency` clients and summarize their latencies.
+    """
+    latencies = np.zeros(len(requests))
+    statuses: Dict[int, int] = {}
+    queue = iter(enumerate(requests))
+
+    async def client():
+        for index, (method, url, body) in queue:
+            start = time.perf_counter()
+            response = await send(method, url, json=body)
+            latencies[index] = time.perf_counter() - start
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    return {
+        "requests": len(requests),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": seconds,
+        "rps": len(requests) / seconds,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "mean_ms": float(latencies.mean() * 1000),
+        "max_ms": float(latencies.max() * 1000),
+    }
+
+
+async def benchmark(
+    scenarios: Dict[str, List[Request]], concurrency: int, warmup: int
+) -> Dict[str, dict]:
+    import httpx
+
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            results = {}
+            for endpoint, requests in scenarios.items():
+                await run_scenario(client.request, requests[:warmup], concurrency)
+                results[endpoint] = await run_scenario(
+                    client.request, requests, concurrency
+                )
+            return results
+
+
+def compare(report: dict, baseline: dict) -> Dict[str, dict]:
+    """
+    Relative change of each metric against a baseline report, e.g. 0.1 is +10%.
+    """
+    return {
+        endpoint: {
+            metric: value / baseline["endpoints"][endpoint][metric] - 1
+            for metric, value in metrics.items()
+            if metric in ["rps", "p50_ms", "p95_ms", "p99_ms"]
+            and baseline["endpoints"][endpoint].get(metric)
+        }
+        for endpoint, metrics in report["endpoints"].items()
+        if endpoint in baseline["endpoints"]
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument(
+        "--artifact", help="Serve this flat artifact instead of the stub model"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON report path, stdout by default")
+    parser.add_argument(
+        "--baseline", help="Report of a previous commit to compare the results with"
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    dataset = pd.read_csv(args.dataset)
+
+    with tempfile.TemporaryDirectory() as directory:
+        artifact = args.artifact
+        if artifact is None:
+            artifact = os.path.join(directory, "stub_model.npz")
+            write_stub_artifact(dataset, artifact)
+
+        # Read by the services when they are imported
+        os.environ["PRICING_DATASET_PATH"] = args.dataset
+        os.environ["INFERENCE_ARTIFACT_PATH"] = artifact
+        os.environ["MODEL_RELOAD_INTERVAL"] = "0"
+        os.environ.pop("MLFLOW_LOGGED_MODEL", None)
+
+        scenarios = build_scenarios(dataset, args.requests, args.seed)
+        results = asyncio.run(benchmark(scenarios, args.concurrency, args.warmup))
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "model": "stub" if args.artifact is None else args.artifact,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "endpoints": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report["baseline_commit"] = baseline.get("commit", "")
+        report["change"] = compare(report, baseline)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
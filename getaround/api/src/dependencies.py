@@ -0,0 +1,71 @@
+import os
+
+from fastapi import Header, HTTPException, Request
+
+from src.services.dataset_store import DatasetStore
+from src.services.executor import BoundedExecutor
+from src.services.model_registry import ModelRegistry
+from src.services.model_router import ModelRouter
+from src.services.prediction_batcher import PredictionBatcher
+from src.services.prediction_cache import PredictionCache
+from src.services.profiler import RequestProfiler
+
+
+def get_dataset_store(request: Request) -> DatasetStore:
+    """
+    Dependency returning the dataset store created in the application lifespan.
+    """
+    return request.app.state.dataset_store
+
+
+def get_executor(request: Request) -> BoundedExecutor:
+    """
+    Dependency returning the executor created in the application lifespan.
+    """
+    return request.app.state.executor
+
+
+def get_model_registry(request: Request) -> ModelRegistry:
+    """
+    Dependency returning the model registry created in the application lifespan.
+    """
+    return request.app.state.model_registry
+
+
+def get_model_router(request: Request) -> ModelRouter:
+    """
+    Dependency returning the model router created in the application lifespan.
+    """
+    return request.app.state.model_router
+
+
+def get_prediction_batcher(request: Request) -> PredictionBatcher:
+    """
+    Dependency returning the prediction batcher created in the application lifespan.
+    """
+    return request.app.state.prediction_batcher
+
+
+def get_prediction_cache(request: Request) -> PredictionCache:
+    """
+    Dependency returning the prediction cache created in the application lifespan.
+    """
+    return request.app.state.prediction_cache
+
+
+def get_profiler(request: Request) -> RequestProfiler:
+    """
+    Dependency returning the request profiler created in the application lifespan.
+    """
+    return request.app.state.profiler
+
+
+def verify_admin_token(x_admin_token: str = Header(default="")):
+    """
+    Dependency protecting the admin endpoints with the ADMIN_TOKEN variable.
+
+    The admin endpoints are disabled when ADMIN_TOKEN is not set.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
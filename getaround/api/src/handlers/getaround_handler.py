@@ -1,46 +1,148 @@
-import os
-import mlflow
+import io
+import json
+from typing import Iterator, List, Optional, Union
+
 import pandas as pd
 
 from src.models.getaround_model import GetaroundModel
+from src.models.group_by_model import GroupBy
+from src.services.data_export import iter_chunks, parse_filter, serialize_chunks
+from src.services.dataset_store import DatasetStore
+from src.services.executor import BoundedExecutor
+from src.services.feature_encoder import FEATURES, FeatureEncoder
+from src.services.metrics import span
+from src.services.model_registry import ModelRegistry
+from src.services.model_router import ModelRouter
+from src.services.prediction_batcher import PredictionBatcher
+from src.services.prediction_cache import PredictionCache
+
+# Size of the chunks of predictions written to the streamed response
+PREDICTIONS_CHUNK_SIZE = 10_000
 
+# Stateless, shared by all the requests
+encoder = FeatureEncoder()
 
-async def sample(count: int):
+
+async def sample(store: DatasetStore, executor: BoundedExecutor, count: int):
     """
-    Asynchronous function to sample a specified number of rows from the Excel file.
+    Asynchronous function to sample a specified number of rows from the dataset in memory.
 
     Args:
+        store (DatasetStore): The dataset store.
+        executor (BoundedExecutor): The executor running the blocking work.
         count (int): The number of rows to sample.
 
     Returns:
         pd.DataFrame: A DataFrame containing the sampled rows.
     """
-    df = pd.read_csv("/app/src/data/get_around_pricing_project.csv")
-    sample = df.sample(count)
+
+    # May parse the file again if it has changed
+    def run():
+        with span("sample"):
+            return store.get().frame.sample(count)
+
+    sample = await executor.run(run)
     return sample
 
 
-async def unique_values(column: str):
+async def unique_values(store: DatasetStore, executor: BoundedExecutor, column: str):
     """
-    Asynchronous function to get unique values from a specified column in the Excel file.
+    Asynchronous function to get the precomputed unique values of a specified column.
 
     Args:
+        store (DatasetStore): The dataset store.
+        executor (BoundedExecutor): The executor running the blocking work.
         column (str): The name of the column to retrieve unique values from.
 
     Returns:
         pd.Series: A Series containing the unique values from the specified column, or False if the column does not exist.
     """
-    df = pd.read_csv("/app/src/data/get_around_pricing_project.csv")
+    # May parse the file again if it has changed
+    values = await executor.run(store.unique_values, column)
     # Check if column exist
-    if column not in df:
+    if values is None:
+        return False
+
+    return values
+
+
+async def group_by(store: DatasetStore, executor: BoundedExecutor, query: GroupBy):
+    """
+    Asynchronous function to aggregate a target column by a categorical column.
+
+    The answer is read from the aggregation cube precomputed with the dataset.
+
+    Args:
+        store (DatasetStore): The dataset store.
+        executor (BoundedExecutor): The executor running the blocking work.
+        query (GroupBy): The column to group by, the target column and the method.
+
+    Returns:
+        str: The JSON records of the aggregation, or False if a column is not available.
+    """
+
+    # May parse the file again if it has changed, the cube is then rebuilt
+    def run():
+        return store.get().cube.query(query.column, query.target_column, query.method)
+
+    response = await executor.run(run)
+    if response is None:
         return False
 
-    return pd.Series(df[column].unique())
+    return response
 
 
-async def predict(input_data: GetaroundModel):
+def export_data(
+    store: DatasetStore,
+    format: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[str]] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> Iterator[bytes]:
     """
-    Prediction.
+    Export rows of the dataset in memory, serialized chunk by chunk.
+
+    The request is validated before anything is streamed, then the rows are read
+    from the snapshot of the dataset at the time of the request, even if the file
+    is reloaded meanwhile.
+
+    Args:
+        store (DatasetStore): The dataset store.
+        format (str): One of ndjson, csv or arrow.
+        columns (list, optional): The columns to export, all of them by default.
+        filters (list, optional): Filter expressions such as `fuel==diesel` or
+            `mileage>=100000`, all of them must match.
+        offset (int): Number of matching rows to skip.
+        limit (int, optional): Maximum number of rows, all of them by default.
+
+    Returns:
+        Iterator[bytes]: The serialized rows.
+
+    Raises:
+        ValueError: If a column or a filter is not valid.
+    """
+    frame = store.get().frame
+    columns = columns or list(frame.columns)
+    unknown_columns = [column for column in columns if column not in frame.columns]
+    if unknown_columns:
+        raise ValueError(f"Unknown columns: {', '.join(unknown_columns)}")
+    parsed_filters = [parse_filter(expression, frame) for expression in filters or []]
+
+    chunks = iter_chunks(frame, columns, parsed_filters, offset, limit)
+    return serialize_chunks(chunks, frame.iloc[:0][columns], format)
+
+
+async def predict(
+    model_router: ModelRouter,
+    batcher: PredictionBatcher,
+    cache: PredictionCache,
+    input_data: GetaroundModel,
+):
+    """
+    Prediction, by one of the loaded models drawn by the model router.
+
+    The response holds the name of the model, to compare the routed models.
 
     Args:
         {
@@ -75,46 +177,95 @@ async def predict(input_data: GetaroundModel):
             "car_type": "suv"
         }
     """
-    rawdf = pd.read_csv("/app/src/data/get_around_pricing_project.csv")
+    # Transform data, the row becomes a DataFrame only with its whole batch
+    with span("encode"):
+        row = encoder.encode_record(input_data)
+
+    # Weighted draw among the routed models
+    loaded_model = model_router.choose()
 
-    # Transform data
-    df = pd.DataFrame(dict(input_data), index=[0])
+    # Same car already priced by this model
+    prediction = cache.get(row, loaded_model.name, loaded_model.version)
 
-    df["mileage"] = df["mileage"].astype("int32")
-    df["engine_power"] = df["engine_power"].astype("int32")
-    df["private_parking_available"] = df["private_parking_available"].astype("bool")
-    df["has_gps"] = df["has_gps"].astype("bool")
-    df["has_air_conditioning"] = df["has_air_conditioning"].astype("bool")
-    df["automatic_car"] = df["automatic_car"].astype("bool")
-    df["has_getaround_connect"] = df["has_getaround_connect"].astype("bool")
-    df["has_speed_regulator"] = df["has_speed_regulator"].astype("bool")
-    df["winter_tires"] = df["winter_tires"].astype("bool")
+    if prediction is None:
+        # Predicted together with the other concurrent requests for this model
+        with span("batched_predict"):
+            prediction = await batcher.predict(row, loaded_model.name)
+        cache.put(row, loaded_model.name, loaded_model.version, prediction)
+
+    # Format response
+    response = {"prediction": prediction, "model": loaded_model.name}
+    return response
 
-    df["model_key"] = df["model_key"].astype("str").str.lower()
-    df["fuel"] = df["fuel"].astype("str").str.lower()
-    df["paint_color"] = df["paint_color"].astype("str").str.lower()
-    df["car_type"] = df["car_type"].astype("str").str.lower()
 
-    # If model key not exist replace with "other" value
-    model_key_values = pd.unique(rawdf["model_key"].str.lower())
-    if df["model_key"][0] not in model_key_values:
-        df["model_key"][0] = "other"
+async def predict_batch(
+    executor: BoundedExecutor,
+    registry: ModelRegistry,
+    input_data: Union[List[GetaroundModel], pd.DataFrame],
+):
+    """
+    Batch prediction, one vectorized call of the model for all the cars.
 
-    MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    Args:
+        executor (BoundedExecutor): The executor running the blocking work.
+        registry (ModelRegistry): The model registry.
+        input_data (list | pd.DataFrame): The cars to price, as GetaroundModel
+            records or as a frame with the GetaroundModel columns.
 
-    # Log model from mlflow
-    MLFLOW_LOGGED_MODEL = os.getenv("MLFLOW_LOGGED_MODEL")
-    logged_model = MLFLOW_LOGGED_MODEL
+    Returns:
+        np.ndarray: The predictions, in the order of the input cars.
+    """
+    loaded_model = registry.current
 
-    # If you want to load model persisted locally
-    # loaded_model = joblib.load('doctor-cancellation-detector/model.joblib')
+    def run():
+        with span("encode"):
+            if isinstance(input_data, pd.DataFrame):
+                df = encoder.encode_frame(input_data)
+            else:
+                df = encoder.encode_records(input_data)
+        with span("model_predict"):
+            return loaded_model.predict(df)
 
-    # Load model as a PyFuncModel.
-    loaded_model = mlflow.pyfunc.load_model(logged_model)
+    return await executor.run(run)
 
-    prediction = loaded_model.predict(df)
 
-    # Format response
-    response = {"prediction": prediction.tolist()[0]}
-    return response
+def read_cars_file(filename: str, content: bytes) -> pd.DataFrame:
+    """
+    Read an uploaded CSV or Parquet file with the columns of the pricing dataset.
+
+    Args:
+        filename (str): The uploaded file name, its extension gives the format.
+        content (bytes): The file content.
+
+    Returns:
+        pd.DataFrame: The GetaroundModel columns of the file.
+
+    Raises:
+        ValueError: If the format is not supported or a column is missing.
+    """
+    with span("read_file"):
+        if filename.endswith(".parquet"):
+            df = pd.read_parquet(io.BytesIO(content))
+        elif filename.endswith(".csv"):
+            df = pd.read_csv(io.BytesIO(content))
+        else:
+            raise ValueError("Only .csv and .parquet files are supported")
+
+    missing_columns = [column for column in FEATURES if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing columns: {', '.join(missing_columns)}")
+
+    return df[FEATURES]
+
+
+def stream_predictions(predictions) -> Iterator[str]:
+    """
+    Serialize the predictions as a JSON object written chunk by chunk.
+    """
+    values = predictions.tolist()
+    yield '{"predictions": ['
+    for start in range(0, len(values), PREDICTIONS_CHUNK_SIZE):
+        chunk = json.dumps(values[start : start + PREDICTIONS_CHUNK_SIZE])[1:-1]
+        yield chunk if start == 0 else "," + chunk
+    yield "]}"
+
@@ -1,6 +1,37 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from .routers import getaround_router
+from .services.dataset_store import DatasetStore
+from .services.executor import (
+    BoundedExecutor,
+    ExecutorSaturatedError,
+    request_queue_times,
+)
+from .services.metrics import (
+    BATCHER_QUEUE_DEPTH,
+    EXECUTOR_IN_FLIGHT,
+    MODEL_VERSION,
+    REQUEST_DURATION,
+)
+from .services.model_registry import (
+    MODEL_RELOAD_INTERVAL,
+    MODEL_URIS,
+    ModelRegistry,
+    parse_assignments,
+)
+from .services.model_router import ModelRouter
+from .services.prediction_batcher import PredictionBatcher
+from .services.prediction_cache import PredictionCache
+from .services.profiler import RequestProfiler
+
+logger = logging.getLogger(__name__)
 
 tags_metadata = [
     {
@@ -8,8 +39,55 @@ tags_metadata = [
         "description": "Show data",
     },
     {"name": "machine-learning", "description": "Prediction Endpoint."},
+    {"name": "admin", "description": "Administration of the served model."},
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Profiler of the slow requests, toggled at runtime from the admin endpoints
+    app.state.profiler = RequestProfiler()
+
+    # Parse the pricing dataset once for the whole life of the process
+    app.state.dataset_store = DatasetStore()
+    app.state.dataset_store.load()
+
+    # Load the model once, it is then kept in memory and hot reloaded
+    app.state.model_registry = ModelRegistry()
+    try:
+        await app.state.model_registry.load()
+    except Exception:
+        logger.exception("Model not loaded at startup, /predict will answer 503")
+    # Other models, routed by weight or scored in shadow
+    await app.state.model_registry.load_named(parse_assignments(MODEL_URIS))
+    app.state.model_router = ModelRouter(app.state.model_registry)
+
+    # Bounded pool for the blocking work, keeps the event loop free
+    app.state.executor = BoundedExecutor()
+
+    # Coalesce the concurrent single-car predictions
+    app.state.prediction_batcher = PredictionBatcher(
+        app.state.model_registry, app.state.executor, app.state.model_router
+    )
+    app.state.prediction_batcher.start()
+
+    # Predictions of the cars already priced by the model currently served
+    app.state.prediction_cache = PredictionCache()
+
+    watcher = None
+    if MODEL_RELOAD_INTERVAL > 0:
+        watcher = asyncio.create_task(app.state.model_registry.watch())
+
+    yield
+
+    await app.state.prediction_batcher.stop()
+    if watcher is not None:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+    app.state.executor.shutdown()
+
+
 app = FastAPI(
     title="🪐 Getaround API",
     description="API for Getaround",
@@ -19,11 +97,69 @@ app = FastAPI(
         "url": "https://github.com/littlerobinson",
     },
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
 
 app.include_router(getaround_router.router)
 
 
+@app.middleware("http")
+async def queue_time_header(request: Request, call_next):
+    """
+    Report the time the request spent waiting for an executor worker.
+    """
+    queue_times = []
+    token = request_queue_times.set(queue_times)
+    try:
+        response = await call_next(request)
+    finally:
+        request_queue_times.reset(token)
+    if queue_times:
+        response.headers["X-Queue-Time-Ms"] = f"{1000 * sum(queue_times):.3f}"
+    return response
+
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """
+    Time every request into the request histogram, by route template.
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await request.app.state.profiler(request, call_next)
+        status = response.status_code
+        return response
+    finally:
+        # The template of the matched route, not the path, bounds the label values
+        route = request.scope.get("route")
+        REQUEST_DURATION.labels(
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        ).observe(time.perf_counter() - start)
+
+
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturatedError):
+    return JSONResponse(
+        status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
 @app.get("/")
 async def root():
     return {"message": "Hello Getaround API!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus metrics: request and stage latency histograms, executor and batcher gauges.
+    """
+    state = request.app.state
+    EXECUTOR_IN_FLIGHT.set(state.executor.stats()["in_flight"])
+    BATCHER_QUEUE_DEPTH.set(state.prediction_batcher.stats()["queue_depth"])
+    registry = state.model_registry
+    MODEL_VERSION.set(registry.current.version if registry.is_loaded else 0)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,9 +1,45 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
 
 import src.handlers.getaround_handler as gh
+from src.dependencies import (
+    get_dataset_store,
+    get_executor,
+    get_model_registry,
+    get_model_router,
+    get_prediction_batcher,
+    get_prediction_cache,
+    get_profiler,
+    verify_admin_token,
+)
 from src.models.getaround_model import GetaroundModel
+from src.models.group_by_model import GroupBy
+from src.services.data_export import MEDIA_TYPES
+from src.services.dataset_store import DatasetStore
+from src.services.executor import BoundedExecutor
+from src.services.model_registry import (
+    DEFAULT_MODEL_NAME,
+    ModelNotLoadedError,
+    ModelRegistry,
+    PredictionInputError,
+    parse_assignments,
+)
+from src.services.model_router import ModelRouter
+from src.services.prediction_batcher import PredictionBatcher
+from src.services.prediction_cache import PredictionCache
+from src.services.profiler import ProfilerUnavailableError, RequestProfiler
 
 import json
+import os
+from typing import List, Literal, Optional
 
 
 router = APIRouter(
@@ -12,6 +48,9 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Maximum number of cars priced in one batch request
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "200000"))
+
 
 @router.get("/")
 async def root():
@@ -25,7 +64,11 @@ async def root():
 
 
 @router.get("/sample", tags=["data"])
-async def sample(count: int = 10):
+async def sample(
+    count: int = 10,
+    store: DatasetStore = Depends(get_dataset_store),
+    executor: BoundedExecutor = Depends(get_executor),
+):
     """
     Endpoint to get a sample of rows from the Geataround data.
 
@@ -35,12 +78,16 @@ async def sample(count: int = 10):
     Returns:
         Response: A JSON response containing the sampled rows.
     """
-    response = await gh.sample(count)
+    response = await gh.sample(store, executor, count)
     return Response(response.to_json(orient="records"), media_type="application/json")
 
 
 @router.get("/unique-values", tags=["data"])
-async def unique_values(column: str):
+async def unique_values(
+    column: str,
+    store: DatasetStore = Depends(get_dataset_store),
+    executor: BoundedExecutor = Depends(get_executor),
+):
     """
     Endpoint to get unique values from a specified column in the Geataround data.
 
@@ -53,13 +100,339 @@ async def unique_values(column: str):
     Raises:
         HTTPException: If the column does not exist.
     """
-    response = await gh.unique_values(column)
+    response = await gh.unique_values(store, executor, column)
     if response is False:
         raise HTTPException(status_code=404, detail="Item not found")
     return Response(response.to_json(orient="records"), media_type="application/json")
 
 
+@router.get("/data", tags=["data"])
+async def data(
+    format: Literal["ndjson", "csv", "arrow"] = "ndjson",
+    columns: Optional[str] = None,
+    filter: List[str] = Query(default=[]),
+    offset: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=0),
+    store: DatasetStore = Depends(get_dataset_store),
+    executor: BoundedExecutor = Depends(get_executor),
+):
+    """
+    Endpoint to stream rows of the Getaround data, to page through the whole dataset.
+
+    Args:
+        format (str): ndjson (one JSON object per line), csv or arrow (IPC stream).
+        columns (str, optional): Comma separated columns to export, all by default.
+        filter (list, optional): Filters that must all match, repeatable, e.g.
+            `filter=fuel==diesel&filter=mileage>=100000`.
+        offset (int): Number of matching rows to skip.
+        limit (int, optional): Maximum number of rows, all of them by default.
+
+    Returns:
+        StreamingResponse: The rows, serialized chunk by chunk.
+
+    Raises:
+        HTTPException: If a column or a filter is not valid.
+    """
+    try:
+        # The snapshot may be parsed again if the file has changed, off the loop
+        chunks = await executor.run(
+            gh.export_data,
+            store,
+            format,
+            columns=columns.split(",") if columns else None,
+            filters=filter,
+            offset=offset,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format])
+
+
+@router.post("/group-by", tags=["data"])
+async def group_by(
+    query: GroupBy,
+    store: DatasetStore = Depends(get_dataset_store),
+    executor: BoundedExecutor = Depends(get_executor),
+):
+    """
+    Endpoint to aggregate a target column by a categorical column of the Geataround data.
+
+    Args:
+        query (GroupBy): The column to group by, the target column and the method
+            (mean, median, max, min, sum or count).
+
+    Returns:
+        Response: A JSON response with one record per value of the grouped column.
+
+    Raises:
+        HTTPException: If one of the columns cannot be aggregated.
+    """
+    response = await gh.group_by(store, executor, query)
+    if response is False:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return Response(response, media_type="application/json")
+
+
 @router.post("/predict", tags=["machine-learning"])
-async def predict(data: GetaroundModel):
-    response = await gh.predict(data)
+async def predict(
+    data: GetaroundModel,
+    model_router: ModelRouter = Depends(get_model_router),
+    batcher: PredictionBatcher = Depends(get_prediction_batcher),
+    cache: PredictionCache = Depends(get_prediction_cache),
+):
+    try:
+        response = await gh.predict(model_router, batcher, cache, data)
+    except ModelNotLoadedError:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    except PredictionInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     return Response(content=json.dumps(response), media_type="application/json")
+
+
+@router.post("/predict/batch", tags=["machine-learning"])
+async def predict_batch(
+    data: List[GetaroundModel],
+    executor: BoundedExecutor = Depends(get_executor),
+    registry: ModelRegistry = Depends(get_model_registry),
+):
+    """
+    Endpoint to price many cars in one request.
+
+    Args:
+        data (list): The cars to price, as GetaroundModel records.
+
+    Returns:
+        StreamingResponse: A JSON object {"predictions": [...]} in the order of the input.
+    """
+    return await _predict_batch(executor, registry, data)
+
+
+@router.post("/predict/batch/file", tags=["machine-learning"])
+async def predict_batch_file(
+    file: UploadFile = File(...),
+    executor: BoundedExecutor = Depends(get_executor),
+    registry: ModelRegistry = Depends(get_model_registry),
+):
+    """
+    Endpoint to price the cars of an uploaded CSV or Parquet file.
+
+    Args:
+        file (UploadFile): A file with the columns of get_around_pricing_project.csv.
+
+    Returns:
+        StreamingResponse: A JSON object {"predictions": [...]} in the order of the file rows.
+    """
+    try:
+        df = await executor.run(
+            gh.read_cars_file, file.filename or "", await file.read()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await _predict_batch(executor, registry, df)
+
+
+async def _predict_batch(executor, registry, cars):
+    if len(cars) > PREDICT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many cars, the maximum is {PREDICT_BATCH_MAX_ROWS}",
+        )
+    try:
+        predictions = await gh.predict_batch(executor, registry, cars)
+    except ModelNotLoadedError:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    except PredictionInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(
+        gh.stream_predictions(predictions), media_type="application/json"
+    )
+
+
+@router.get("/admin/model", tags=["admin"], dependencies=[Depends(verify_admin_token)])
+async def model_info(registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    Endpoint to get the model currently served.
+
+    Returns:
+        dict: The model URI, its version in the registry and its load timestamp.
+    """
+    try:
+        loaded_model = registry.current
+    except ModelNotLoadedError:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return {
+        "model_uri": loaded_model.uri,
+        "version": loaded_model.version,
+        "loaded_at": loaded_model.loaded_at,
+    }
+
+
+@router.post(
+    "/admin/reload-model", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def reload_model(
+    model_uri: Optional[str] = None,
+    name: str = DEFAULT_MODEL_NAME,
+    registry: ModelRegistry = Depends(get_model_registry),
+):
+    """
+    Endpoint to load a model and swap it in without dropping running requests.
+
+    Args:
+        model_uri (str, optional): The model URI, MLFLOW_LOGGED_MODEL by default
+            for the default model.
+        name (str): Name of the model in the registry, a new name adds a model.
+
+    Returns:
+        dict: The model name, URI and version in the registry.
+    """
+    try:
+        loaded_model = await registry.load(model_uri, name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model not reloaded: {e}")
+    return {
+        "name": loaded_model.name,
+        "model_uri": loaded_model.uri,
+        "version": loaded_model.version,
+    }
+
+
+@router.get("/admin/models", tags=["admin"], dependencies=[Depends(verify_admin_token)])
+async def models_info(model_router: ModelRouter = Depends(get_model_router)):
+    """
+    Endpoint to get the loaded models, the routes and the shadow comparison.
+
+    Returns:
+        dict: Loaded models, routes and requests routed to each model, shadow model
+        with its latency and deviation from the served predictions.
+    """
+    return model_router.stats()
+
+
+@router.post(
+    "/admin/routing", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def configure_routing(
+    routes: str = "",
+    shadow: Optional[str] = None,
+    model_router: ModelRouter = Depends(get_model_router),
+):
+    """
+    Endpoint to change the routes of /predict and the shadow model at runtime.
+
+    Args:
+        routes (str): Weight of each model, e.g. `Ridge=0.8,XGBoost=0.2`, empty to
+            route everything to the default model.
+        shadow (str, optional): Name of the shadow model, none by default.
+
+    Returns:
+        dict: The new routing state.
+    """
+    try:
+        model_router.configure(parse_assignments(routes, float), shadow)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return model_router.stats()
+
+
+@router.delete(
+    "/admin/models/{name}", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def unload_model(
+    name: str, registry: ModelRegistry = Depends(get_model_registry)
+):
+    """
+    Endpoint to unload a model other than the default one.
+
+    Returns:
+        dict: The remaining models.
+    """
+    try:
+        unloaded = registry.unload(name)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not unloaded:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {"models": registry.names}
+
+
+@router.get(
+    "/admin/batcher", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def batcher_stats(batcher: PredictionBatcher = Depends(get_prediction_batcher)):
+    """
+    Endpoint to get the metrics of the /predict micro-batching.
+
+    Returns:
+        dict: Queue depth, number of requests and batches, batch sizes distribution.
+    """
+    return batcher.stats()
+
+
+@router.get(
+    "/admin/prediction-cache",
+    tags=["admin"],
+    dependencies=[Depends(verify_admin_token)],
+)
+async def prediction_cache_stats(
+    cache: PredictionCache = Depends(get_prediction_cache),
+):
+    """
+    Endpoint to get the metrics of the /predict result cache.
+
+    Returns:
+        dict: Size, hits, misses, hit ratio, expirations, evictions and invalidations.
+    """
+    return cache.stats()
+
+
+@router.get(
+    "/admin/executor", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def executor_stats(executor: BoundedExecutor = Depends(get_executor)):
+    """
+    Endpoint to get the metrics of the executor running the blocking work.
+
+    Returns:
+        dict: Jobs in progress, submitted and rejected, and queue times.
+    """
+    return executor.stats()
+
+
+@router.get(
+    "/admin/profiler", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def profiler_info(profiler: RequestProfiler = Depends(get_profiler)):
+    """
+    Endpoint to get the state of the slow requests profiler.
+
+    Returns:
+        dict: Whether it is enabled, its threshold and the profiles written.
+    """
+    return profiler.stats()
+
+
+@router.post(
+    "/admin/profiler", tags=["admin"], dependencies=[Depends(verify_admin_token)]
+)
+async def configure_profiler(
+    enabled: Optional[bool] = None,
+    threshold_ms: Optional[float] = None,
+    profiler: RequestProfiler = Depends(get_profiler),
+):
+    """
+    Endpoint to toggle the slow requests profiler at runtime.
+
+    Args:
+        enabled (bool, optional): Enable or disable the profiler.
+        threshold_ms (float, optional): Requests slower than this are profiled.
+
+    Returns:
+        dict: The new state of the profiler.
+    """
+    try:
+        profiler.configure(enabled=enabled, threshold_ms=threshold_ms)
+    except ProfilerUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return profiler.stats()
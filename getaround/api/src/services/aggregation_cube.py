@@ -0,0 +1,113 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.services.feature_encoder import BOOLEAN_FEATURES, CATEGORICAL_FEATURES
+
+GROUP_BY_COLUMNS = CATEGORICAL_FEATURES + BOOLEAN_FEATURES
+TARGET_COLUMNS = ["mileage", "engine_power", "rental_price_per_day"]
+
+
+@dataclass(frozen=True)
+class _GroupedTarget:
+    """
+    Values of a target column sorted by group, then by value.
+
+    The values of group `i` are `sorted_values[offsets[i]:offsets[i + 1]]`.
+    """
+
+    sorted_values: np.ndarray
+    offsets: np.ndarray
+    sums: np.ndarray
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def aggregate(self, method: str) -> np.ndarray:
+        counts = self.counts
+        starts = self.offsets[:-1]
+        if method == "count":
+            return counts
+        if method == "sum":
+            return self.sums
+        if method == "mean":
+            return self.sums / counts
+        if method == "min":
+            return self.sorted_values[starts]
+        if method == "max":
+            return self.sorted_values[self.offsets[1:] - 1]
+        if method == "median":
+            # Middle of each sorted group, average of the two middles for even sizes
+            low = self.sorted_values[starts + (counts - 1) // 2]
+            high = self.sorted_values[starts + counts // 2]
+            return (low + high) / 2
+        raise ValueError(f"Unknown aggregation method {method}")
+
+
+class AggregationCube:
+    """
+    Precomputed aggregations of the target columns by each categorical column.
+
+    Each target is sorted once within the groups of each column, so that count,
+    sum, mean, min, max and median are all read from a few array lookups. The JSON
+    answer of each query is then cached.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._keys: Dict[str, List] = {}
+        self._targets: Dict[Tuple[str, str], _GroupedTarget] = {}
+        self._cache: Dict[Tuple[str, str, str], str] = {}
+
+        targets = [column for column in TARGET_COLUMNS if column in frame]
+        for column in GROUP_BY_COLUMNS:
+            if column not in frame:
+                continue
+            codes, keys = pd.factorize(frame[column], sort=True)
+            self._keys[column] = keys.tolist()
+            offsets = np.concatenate(
+                ([0], np.cumsum(np.bincount(codes, minlength=len(keys))))
+            )
+            for target in targets:
+                values = frame[target].to_numpy(dtype=np.float64)
+                order = np.lexsort((values, codes))
+                self._targets[(column, target)] = _GroupedTarget(
+                    sorted_values=values[order],
+                    offsets=offsets,
+                    sums=np.bincount(codes, weights=values, minlength=len(keys)),
+                )
+
+    def query(self, column: str, target_column: str, method: str) -> Optional[str]:
+        """
+        Aggregate a target column by a categorical column.
+
+        Args:
+            column (str): The column to group by.
+            target_column (str): The column to aggregate.
+            method (str): One of mean, median, max, min, sum or count.
+
+        Returns:
+            str: The JSON records [{column: key, target_column: value}, ...], or None
+            if one of the columns is not part of the cube.
+        """
+        cache_key = (column, target_column, method)
+        response = self._cache.get(cache_key)
+        if response is not None:
+            return response
+
+        grouped = self._targets.get((column, target_column))
+        if grouped is None:
+            return None
+
+        values = grouped.aggregate(method).tolist()
+        response = json.dumps(
+            [
+                {column: key, target_column: value}
+                for key, value in zip(self._keys[column], values)
+            ]
+        )
+        self._cache[cache_key] = response
+        return response
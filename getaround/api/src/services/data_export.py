@@ -0,0 +1,179 @@
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Rows filtered and serialized at once, bounds the memory of a response
+DATA_EXPORT_CHUNK_SIZE = int(os.getenv("DATA_EXPORT_CHUNK_SIZE", "10000"))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# "column operator value", the two-character operators first
+FILTER_PATTERN = re.compile(r"^(.+?)\s*(==|!=|>=|<=|>|<)\s*(.*)$")
+ORDER_OPERATORS = {">=", "<=", ">", "<"}
+
+
+@dataclass(frozen=True)
+class Filter:
+    """
+    Comparison of a column with a constant, e.g. `mileage>=100000`.
+
+    Attributes:
+        column (str): The compared column.
+        operator (str): One of ==, !=, >=, <=, > or <.
+        value: The constant, converted to the type of the column.
+    """
+
+    column: str
+    operator: str
+    value: object
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        values = frame[self.column]
+        if self.operator == "==":
+            result = values == self.value
+        elif self.operator == "!=":
+            result = values != self.value
+        elif self.operator == ">=":
+            result = values >= self.value
+        elif self.operator == "<=":
+            result = values <= self.value
+        elif self.operator == ">":
+            result = values > self.value
+        else:
+            result = values < self.value
+        return result.to_numpy(dtype=bool)
+
+
+def parse_filter(expression: str, frame: pd.DataFrame) -> Filter:
+    """
+    Parse a filter expression against the columns of the dataset.
+
+    Args:
+        expression (str): e.g. `fuel==diesel` or `mileage>=100000`.
+        frame (pd.DataFrame): The dataset, its dtypes give the type of the value.
+
+    Returns:
+        Filter: The parsed filter.
+
+    Raises:
+        ValueError: If the expression, its column or its value is not valid.
+    """
+    match = FILTER_PATTERN.match(expression.strip())
+    if match is None:
+        raise ValueError(f"Invalid filter {expression!r}, expected column<op>value")
+    column, operator, value = match.groups()
+    if column not in frame.columns:
+        raise ValueError(f"Unknown column {column!r} in filter {expression!r}")
+
+    dtype = frame[column].dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        if value.lower() not in ("true", "false"):
+            raise ValueError(f"Column {column!r} is boolean, use true or false")
+        if operator in ORDER_OPERATORS:
+            raise ValueError(f"Only == and != are supported on column {column!r}")
+        return Filter(column, operator, value.lower() == "true")
+    if pd.api.types.is_numeric_dtype(dtype):
+        try:
+            return Filter(column, operator, float(value))
+        except ValueError:
+            raise ValueError(f"Column {column!r} is numeric, got {value!r}")
+    if operator in ORDER_OPERATORS:
+        raise ValueError(f"Only == and != are supported on column {column!r}")
+    return Filter(column, operator, value)
+
+
+def iter_chunks(
+    frame: pd.DataFrame,
+    columns: List[str],
+    filters: List[Filter],
+    offset: int = 0,
+    limit: Optional[int] = None,
+    chunk_size: int = DATA_EXPORT_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Select the rows of the dataset chunk by chunk.
+
+    The filters are evaluated on one chunk of columns at a time, and the offset
+    and limit apply to the filtered rows. Without filters, the offset is a slice
+    of the frame, so a page costs the same wherever it is in the dataset.
+
+    Yields:
+        pd.DataFrame: The projected rows of each chunk, at most `chunk_size`.
+    """
+    if not filters:
+        stop = None if limit is None else offset + limit
+        frame, offset = frame.iloc[offset:stop], 0
+
+    remaining = limit
+    for start in range(0, len(frame), chunk_size):
+        if remaining == 0:
+            return
+        chunk = frame.iloc[start : start + chunk_size]
+        if filters:
+            chunk = chunk[np.logical_and.reduce([f.mask(chunk) for f in filters])]
+        if offset:
+            skipped = min(offset, len(chunk))
+            chunk, offset = chunk.iloc[skipped:], offset - skipped
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        if len(chunk):
+            yield chunk[columns]
+
+
+def serialize_chunks(
+    chunks: Iterator[pd.DataFrame], template: pd.DataFrame, format: str
+) -> Iterator[bytes]:
+    """
+    Serialize the chunks as NDJSON, CSV or an Arrow IPC stream.
+
+    Args:
+        chunks (iterator): The selected rows, chunk by chunk.
+        template (pd.DataFrame): Empty frame with the projected columns, gives the
+            CSV header and the Arrow schema even when no row is selected.
+        format (str): One of ndjson, csv or arrow.
+
+    Yields:
+        bytes: The serialized chunks.
+    """
+    if format == "ndjson":
+        for chunk in chunks:
+            yield chunk.to_json(orient="records", lines=True).encode()
+    elif format == "csv":
+        yield template.to_csv(index=False).encode()
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=False).encode()
+    elif format == "arrow":
+        yield from _serialize_arrow(chunks, template)
+    else:
+        raise ValueError(f"Unsupported format {format!r}")
+
+
+def _serialize_arrow(chunks, template):
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(template, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(
+                pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -0,0 +1,111 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.services.aggregation_cube import AggregationCube
+from src.services.metrics import span
+from src.services.pricing_data import load_pricing_dataset
+
+PRICING_DATASET_PATH = os.getenv(
+    "PRICING_DATASET_PATH", "/app/src/data/get_around_pricing_project.csv"
+)
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """
+    Immutable view of the pricing dataset at a given file modification time.
+
+    Attributes:
+        frame (pd.DataFrame): The typed dataset.
+        unique_values (dict): Unique values of each column, in order of appearance.
+        cube (AggregationCube): Precomputed aggregations for the group-by queries.
+        mtime (float): Modification time of the source file when it was parsed.
+        version (int): Incremented each time the file is parsed again.
+    """
+
+    frame: pd.DataFrame
+    unique_values: Dict[str, pd.Series] = field(repr=False)
+    cube: AggregationCube = field(repr=False)
+    mtime: float
+    version: int
+
+
+class DatasetStore:
+    """
+    Application-level store of the pricing dataset.
+
+    The CSV is loaded once and kept in memory, through the typed columnar cache of
+    pricing_data, and loaded again only when the modification time of the file
+    changes.
+    """
+
+    def __init__(self, path: str = PRICING_DATASET_PATH):
+        self.path = path
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> DatasetSnapshot:
+        """
+        Parse the CSV file and replace the current snapshot.
+
+        Returns:
+            DatasetSnapshot: The new snapshot.
+        """
+        with self._lock:
+            return self._load(os.stat(self.path).st_mtime)
+
+    def get(self) -> DatasetSnapshot:
+        """
+        Return the current snapshot, reloading it if the file has changed on disk.
+
+        Returns:
+            DatasetSnapshot: The current snapshot.
+        """
+        mtime = os.stat(self.path).st_mtime
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime == mtime:
+            return snapshot
+
+        with self._lock:
+            # Another request may have reloaded the file while we were waiting
+            if self._snapshot is not None and self._snapshot.mtime == mtime:
+                return self._snapshot
+            return self._load(mtime)
+
+    def unique_values(self, column: str) -> Optional[pd.Series]:
+        """
+        Get the precomputed unique values of a column.
+
+        Args:
+            column (str): The name of the column.
+
+        Returns:
+            pd.Series: The unique values, or None if the column does not exist.
+        """
+        return self.get().unique_values.get(column)
+
+    def _load(self, mtime: float) -> DatasetSnapshot:
+        with span("dataset_load"):
+            return self._parse(mtime)
+
+    def _parse(self, mtime: float) -> DatasetSnapshot:
+        frame = load_pricing_dataset(self.path)
+
+        unique_values = {
+            column: pd.Series(frame[column].unique(), name=column)
+            for column in frame.columns
+        }
+
+        version = 1 if self._snapshot is None else self._snapshot.version + 1
+        self._snapshot = DatasetSnapshot(
+            frame=frame,
+            unique_values=unique_values,
+            cube=AggregationCube(frame),
+            mtime=mtime,
+            version=version,
+        )
+        return self._snapshot
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.services.metrics import STAGE_DURATION
+
+EXECUTOR_MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", str(os.cpu_count() or 4)))
+EXECUTOR_MAX_QUEUE = int(os.getenv("EXECUTOR_MAX_QUEUE", "64"))
+
+# Queue times of the current request, set by the middleware of the application
+request_queue_times: ContextVar[Optional[List[float]]] = ContextVar(
+    "request_queue_times", default=None
+)
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the executor has no free worker and its queue is full."""
+
+
+def record_queue_time(queue_time: float):
+    """
+    Add a queue time, in seconds, to the timings of the current request.
+    """
+    queue_times = request_queue_times.get()
+    if queue_times is not None:
+        queue_times.append(queue_time)
+
+
+class BoundedExecutor:
+    """
+    Thread pool running the blocking work of the handlers off the event loop.
+
+    pandas, scikit-learn and XGBoost release the GIL in their heavy loops, so
+    threads are enough to keep the event loop responsive. At most `max_workers`
+    jobs run at once and `max_queue` more may wait, beyond that new jobs are
+    rejected with ExecutorSaturatedError instead of piling up.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = EXECUTOR_MAX_WORKERS,
+        max_queue: int = EXECUTOR_MAX_QUEUE,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="getaround"
+        )
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.submitted_total = 0
+        self.rejected_total = 0
+        self.queue_time_seconds_total = 0.0
+        self.queue_time_seconds_max = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking function in the pool and record its queue time on the request.
+
+        Raises:
+            ExecutorSaturatedError: If all the workers are busy and the queue is full.
+        """
+        result, queue_time = await self.run_timed(fn, *args, **kwargs)
+        record_queue_time(queue_time)
+        return result
+
+    async def run_timed(self, fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+        """
+        Run a blocking function in the pool.
+
+        Returns:
+            tuple: The result of the function and the time it waited for a worker,
+            in seconds.
+
+        Raises:
+            ExecutorSaturatedError: If all the workers are busy and the queue is full.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected_total += 1
+                raise ExecutorSaturatedError("Too many requests in progress")
+            self._in_flight += 1
+            self.submitted_total += 1
+
+        submitted_at = time.perf_counter()
+
+        def call():
+            queue_time = time.perf_counter() - submitted_at
+            return fn(*args, **kwargs), queue_time
+
+        future = self._pool.submit(call)
+        # The slot is released when the job ends, even if the request is cancelled
+        future.add_done_callback(self._release)
+
+        result, queue_time = await asyncio.wrap_future(future)
+        STAGE_DURATION.labels("executor_queue").observe(queue_time)
+        with self._lock:
+            self.queue_time_seconds_total += queue_time
+            self.queue_time_seconds_max = max(self.queue_time_seconds_max, queue_time)
+        return result, queue_time
+
+    @property
+    def idle_workers(self) -> int:
+        """
+        Number of workers without a job, the optional work only runs on those.
+        """
+        return max(0, self.max_workers - self._in_flight)
+
+    def stats(self) -> dict:
+        """
+        Return the executor metrics.
+
+        Returns:
+            dict: Jobs in progress, submitted and rejected, and queue times.
+        """
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "submitted_total": self.submitted_total,
+            "rejected_total": self.rejected_total,
+            "mean_queue_time_ms": (
+                1000 * self.queue_time_seconds_total / self.submitted_total
+                if self.submitted_total
+                else 0.0
+            ),
+            "max_queue_time_ms": 1000 * self.queue_time_seconds_max,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
@@ -0,0 +1,121 @@
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.models.getaround_model import GetaroundModel
+
+NUMERIC_FEATURES = ["mileage", "engine_power"]
+BOOLEAN_FEATURES = [
+    "private_parking_available",
+    "has_gps",
+    "has_air_conditioning",
+    "automatic_car",
+    "has_getaround_connect",
+    "has_speed_regulator",
+    "winter_tires",
+]
+CATEGORICAL_FEATURES = ["model_key", "fuel", "paint_color", "car_type"]
+FEATURES = list(GetaroundModel.model_fields)
+
+# dtype of each model input column, in the order of GetaroundModel
+FEATURE_DTYPES = {
+    feature: (
+        np.int32
+        if feature in NUMERIC_FEATURES
+        else np.bool_
+        if feature in BOOLEAN_FEATURES
+        else object
+    )
+    for feature in FEATURES
+}
+
+# One car with its values normalized, in the order of FEATURES
+EncodedRow = Tuple
+
+
+class FeatureEncoder:
+    """
+    Normalize GetaroundModel inputs into the model input.
+
+    The values are cast and categories are lower-cased, so encoding one car is a
+    few Python operations with no DataFrame involved. Rare and unknown categories
+    are grouped by the model itself, with the thresholds learned at training; the
+    models trained before that get their unknown model keys replaced, see
+    group_unknown_model_keys.
+    """
+
+    def __init__(self):
+        self._casts = [
+            int if dtype is np.int32 else bool if dtype is np.bool_ else _lower
+            for dtype in FEATURE_DTYPES.values()
+        ]
+
+    def encode_record(self, record: GetaroundModel) -> EncodedRow:
+        """
+        Encode one car.
+
+        Args:
+            record (GetaroundModel): The validated input.
+
+        Returns:
+            tuple: The normalized values, in the order of FEATURES.
+        """
+        return tuple(
+            cast(getattr(record, feature))
+            for cast, feature in zip(self._casts, FEATURES)
+        )
+
+    def encode_records(self, records: Sequence[GetaroundModel]) -> pd.DataFrame:
+        """
+        Encode many cars into one model input frame.
+        """
+        return self.to_frame([self.encode_record(record) for record in records])
+
+    def encode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Encode a frame of cars with the GetaroundModel columns, column by column.
+        """
+        data = {}
+        for feature, dtype in FEATURE_DTYPES.items():
+            column = df[feature]
+            if dtype is object:
+                column = column.astype("str").str.lower()
+            data[feature] = column.to_numpy(dtype=dtype)
+        return pd.DataFrame(data, copy=False)
+
+    @staticmethod
+    def to_frame(rows: List[EncodedRow]) -> pd.DataFrame:
+        """
+        Build the model input frame from encoded rows, one array per column.
+        """
+        columns = list(zip(*rows)) or [()] * len(FEATURES)
+        data = {
+            feature: np.array(values, dtype=dtype)
+            for (feature, dtype), values in zip(FEATURE_DTYPES.items(), columns)
+        }
+        return pd.DataFrame(data, copy=False)
+
+    @staticmethod
+    def group_unknown_model_keys(
+        df: pd.DataFrame, known_model_keys: Iterable[str]
+    ) -> pd.DataFrame:
+        """
+        Replace the model keys a model does not know by "other".
+
+        Args:
+            df (pd.DataFrame): The model input frame.
+            known_model_keys (Iterable[str]): The model keys known by the model.
+
+        Returns:
+            pd.DataFrame: A frame sharing the other columns with `df`.
+        """
+        model_key = df["model_key"]
+        # If model key not exist replace with "other" value
+        return df.assign(
+            model_key=model_key.where(model_key.isin(known_model_keys), "other")
+        )
+
+
+def _lower(value) -> str:
+    return str(value).lower()
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+ARTIFACT_FORMAT_VERSION = 1
+
+# Rows evaluated at once by the trees, bounds the memory of the node matrix
+TREES_CHUNK_SIZE = 10_000
+
+
+class FlatPipeline:
+    """
+    Pricing pipeline evaluated with NumPy from the flat artifact of the trainer.
+
+    It reproduces the ColumnTransformer (StandardScaler on the numeric features,
+    lower-casing, rare category grouping and one-hot encoding of the categorical
+    ones) and the regressor, linear or tree ensemble, exported by
+    training/export.py.
+    """
+
+    def __init__(self, arrays: dict):
+        if int(arrays["format_version"]) != ARTIFACT_FORMAT_VERSION:
+            raise ValueError("Unsupported inference artifact version")
+
+        self.numeric_features = arrays["numeric_features"].tolist()
+        self.scaler_mean = arrays["scaler_mean"]
+        self.scaler_scale = arrays["scaler_scale"]
+        self.categorical_features = arrays["categorical_features"].tolist()
+        self.category_index = [
+            {
+                category: index
+                for index, category in enumerate(arrays[f"categories_{i}"].tolist())
+            }
+            for i in range(len(self.categorical_features))
+        ]
+        # Rare and unknown values of these columns are encoded as "other"
+        self.grouped_features = set(
+            arrays.get("grouped_features", np.empty(0)).tolist()
+        )
+        other_category = str(arrays.get("other_category", ""))
+        self.default_index = [
+            index.get(other_category, -1) if feature in self.grouped_features else -1
+            for feature, index in zip(self.categorical_features, self.category_index)
+        ]
+        # As the OneHotEncoder, "error" for the artifacts exported before the option
+        self.handle_unknown = str(arrays.get("handle_unknown", "error"))
+        self.n_features = len(self.numeric_features) + sum(
+            len(index) for index in self.category_index
+        )
+
+        self.kind = str(arrays["kind"])
+        if self.kind == "linear":
+            self.coef = arrays["coef"]
+            self.intercept = float(arrays["intercept"])
+        else:
+            for key in [
+                "feature",
+                "threshold",
+                "left",
+                "right",
+                "missing",
+                "value",
+                "roots",
+            ]:
+                setattr(self, key, arrays[key])
+            self.max_depth = int(arrays["max_depth"])
+            self.base = float(arrays["base"])
+            self.scale = float(arrays["scale"])
+            self.strict = bool(arrays["strict"])
+            self.zero_as_missing = bool(arrays["zero_as_missing"])
+
+    @classmethod
+    def load(cls, path: str) -> "FlatPipeline":
+        """
+        Load an artifact written by training/export.py.
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls({key: arrays[key] for key in arrays.files})
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Predict the rental price per day of each row of the model input.
+        """
+        X = self.transform(df)
+        if self.kind == "linear":
+            return X @ self.coef + self.intercept
+        return np.concatenate(
+            [
+                self._predict_trees(X[start : start + TREES_CHUNK_SIZE])
+                for start in range(0, len(X), TREES_CHUNK_SIZE)
+            ]
+            or [np.empty(0)]
+        )
+
+    def categories(self, feature: str) -> list:
+        """
+        Categories of a categorical feature, in the order of the one-hot columns.
+        """
+        return list(self.category_index[self.categorical_features.index(feature)])
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Build the design matrix, columns in the order of the ColumnTransformer.
+
+        Raises:
+            ValueError: If a column not grouped has an unknown category and the
+                OneHotEncoder rejected them, as the fitted pipeline does.
+        """
+        n_rows = len(df)
+        X = np.zeros((n_rows, self.n_features))
+
+        n_numeric = len(self.numeric_features)
+        numeric = df[self.numeric_features].to_numpy(dtype=np.float64)
+        X[:, :n_numeric] = (numeric - self.scaler_mean) / self.scaler_scale
+
+        rows = np.arange(n_rows)
+        offset = n_numeric
+        for feature, index, default in zip(
+            self.categorical_features, self.category_index, self.default_index
+        ):
+            # Each distinct value is lower-cased and looked up once, then taken by code
+            codes, values = pd.factorize(df[feature])
+            values_columns = np.array(
+                [index.get(str(value).lower(), default) for value in values] + [default]
+            )
+            # Unknown categories of the columns not grouped are left as all zeros
+            columns = values_columns[codes]
+            known = columns >= 0
+            if self.handle_unknown == "error" and not known.all():
+                unknown = sorted({str(v) for v in df[feature][~known].tolist()})
+                raise ValueError(
+                    f"Found unknown categories {unknown} in column {feature}"
+                )
+            X[rows[known], offset + columns[known]] = 1.0
+            offset += len(index)
+
+        return X
+
+    def _predict_trees(self, X: np.ndarray) -> np.ndarray:
+        # Trees compare the float32 values of the input, as scikit-learn and XGBoost do
+        X = X.astype(np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+
+        # Leaves loop on themselves, so max_depth steps bring every row to a leaf
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            if self.strict:
+                go_left = values < self.threshold[nodes]
+            else:
+                go_left = values <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if self.zero_as_missing:
+                next_nodes = np.where(values == 0, self.missing[nodes], next_nodes)
+            nodes = next_nodes
+        return self.base + self.scale * self.value[nodes].sum(axis=1)
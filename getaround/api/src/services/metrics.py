@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets from 0.5ms to 10s, the stages range from a dict lookup to a model load
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REQUEST_DURATION = Histogram(
+    "getaround_request_duration_seconds",
+    "Duration of the HTTP requests, by route.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "getaround_stage_duration_seconds",
+    "Duration of the stages of the request handling.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "getaround_stage_errors_total",
+    "Stages that raised an exception.",
+    ["stage"],
+)
+PREDICTION_CACHE_LOOKUPS = Counter(
+    "getaround_prediction_cache_lookups_total",
+    "Lookups of the single-car prediction cache, by result (hit or miss).",
+    ["result"],
+)
+MODEL_PREDICT_DURATION = Histogram(
+    "getaround_model_predict_duration_seconds",
+    "Duration of the model calls of /predict, by model and role (served or shadow).",
+    ["model", "role"],
+    buckets=LATENCY_BUCKETS,
+)
+ROUTED_PREDICTIONS = Counter(
+    "getaround_routed_predictions_total",
+    "Single-car predictions routed to each model.",
+    ["model"],
+)
+SHADOW_DEVIATION = Histogram(
+    "getaround_shadow_deviation",
+    "Absolute difference between the shadow and the served prediction, per car.",
+    ["model"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "getaround_executor_in_flight",
+    "Jobs running or waiting in the executor.",
+)
+BATCHER_QUEUE_DEPTH = Gauge(
+    "getaround_batcher_queue_depth",
+    "Single-car predictions waiting for their batch.",
+)
+MODEL_VERSION = Gauge(
+    "getaround_model_version",
+    "Version of the model currently served, 0 if none is loaded.",
+)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time a stage of the request handling into the stage histogram.
+
+    Usable in the event loop as well as in the executor threads, the
+    histograms are thread safe.
+
+    Args:
+        stage (str): Name of the stage, a label of getaround_stage_duration_seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
@@ -0,0 +1,378 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from src.services.feature_encoder import FeatureEncoder
+from src.services.flat_pipeline import FlatPipeline
+from src.services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+# Flat artifact exported by the trainer, preferred to MLflow at startup
+INFERENCE_ARTIFACT_PATH = os.getenv(
+    "INFERENCE_ARTIFACT_PATH", "/app/src/artifacts/pricing_model.npz"
+)
+# Other models kept loaded next to the default one, e.g.
+# "Ridge=models:/Ridge/3,XGBoost=/app/src/artifacts/xgboost.npz"
+MODEL_URIS = os.getenv("MODEL_URIS", "")
+
+# Name of the model loaded from INFERENCE_ARTIFACT_PATH or MLFLOW_LOGGED_MODEL
+DEFAULT_MODEL_NAME = "default"
+
+
+class ModelNotLoadedError(Exception):
+    """Raised when a prediction is requested before any model has been loaded."""
+
+
+class PredictionInputError(ValueError):
+    """Raised when the model rejects the values of a car, e.g. an unknown category."""
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """
+    A model kept in memory by the registry.
+
+    Attributes:
+        name (str): Name of the model in the registry, the key of the routes.
+        uri (str): The MLflow URI or the artifact path the model was loaded from.
+        model: The loaded pyfunc model or FlatPipeline.
+        version (int): Incremented each time a model is swapped in, whatever its name.
+        loaded_at (float): Timestamp of the load.
+        known_model_keys (frozenset, optional): For a model that does not group the
+            rare model keys itself, the model keys it knows, the others are
+            replaced by "other" before the prediction.
+    """
+
+    name: str
+    uri: str
+    model: Any
+    version: int
+    loaded_at: float
+    known_model_keys: Optional[FrozenSet[str]] = None
+
+    def predict(self, df):
+        """
+        Predict the rental price per day of each row of the model input.
+
+        Raises:
+            PredictionInputError: If the model rejects the values of a row.
+        """
+        if self.known_model_keys is not None:
+            df = FeatureEncoder.group_unknown_model_keys(df, self.known_model_keys)
+        try:
+            return self.model.predict(df)
+        except ValueError as e:
+            raise PredictionInputError(str(e)) from e
+
+
+def parse_assignments(value: str, cast: Callable[[str], Any] = str) -> Dict[str, Any]:
+    """
+    Parse a `name=value,name=value` setting such as MODEL_URIS or MODEL_ROUTES.
+
+    Args:
+        value (str): The setting, empty for none.
+        cast (callable): Conversion of each value.
+
+    Returns:
+        dict: The values by name, in the order of the setting.
+
+    Raises:
+        ValueError: If an item has no name or its value cannot be converted.
+    """
+    assignments = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        name, separator, raw_value = item.partition("=")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid item {item!r}, expected name=value")
+        assignments[name.strip()] = cast(raw_value.strip())
+    return assignments
+
+
+def load_model(model_uri: str):
+    """
+    Load a flat .npz artifact from local disk, or a model from MLflow.
+
+    Args:
+        model_uri (str): The artifact path or the logged model URI.
+
+    Returns:
+        The loaded model, with a predict method taking the model input frame.
+    """
+    if model_uri.endswith(".npz"):
+        return FlatPipeline.load(model_uri)
+    return load_mlflow_model(model_uri)
+
+
+def ungrouped_model_keys(model) -> Optional[FrozenSet[str]]:
+    """
+    Return the model keys of a model that does not group the rare ones itself.
+
+    The models trained before the RareCategoryGrouper step saw the rare model keys
+    as "other" and reject an unknown one, so the API replaces their unknown model
+    keys by "other", as it did then.
+
+    Args:
+        model: A FlatPipeline or an MLflow model of a scikit-learn pipeline.
+
+    Returns:
+        frozenset: The model keys known by the model, None if it groups the rare
+        and unknown ones itself.
+    """
+    if isinstance(model, FlatPipeline):
+        if "model_key" in model.grouped_features:
+            return None
+        return frozenset(model.categories("model_key"))
+
+    try:
+        pipeline = model.get_raw_model()
+        categorical_step = pipeline.named_steps["preprocessor"].named_transformers_[
+            "cat"
+        ]
+    except Exception:
+        logger.warning("Model not inspected, its model keys are passed unchanged")
+        return None
+    if categorical_step.named_steps.get("rare") not in (None, "passthrough"):
+        return None
+    onehot = categorical_step.named_steps["onehot"]
+    model_key_index = list(onehot.feature_names_in_).index("model_key")
+    return frozenset(onehot.categories_[model_key_index].tolist())
+
+
+def load_mlflow_model(model_uri: str):
+    """
+    Load a model as a PyFuncModel from the MLflow tracking server.
+
+    Args:
+        model_uri (str): The logged model URI.
+
+    Returns:
+        mlflow.pyfunc.PyFuncModel: The loaded model.
+    """
+    # Imported here so the data endpoints do not pay the mlflow import time
+    import mlflow
+
+    MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+
+    return mlflow.pyfunc.load_model(model_uri)
+
+
+def resolve_model_version(model_uri: str) -> Optional[str]:
+    """
+    Return the registered version an alias or stage model URI points to.
+
+    `models:/Name@alias`, `models:/Name/Stage` and `models:/Name/latest` follow the
+    MLflow model registry, so the version they point to changes from outside the
+    process when a new version is promoted.
+
+    Args:
+        model_uri (str): The logged model URI.
+
+    Returns:
+        str: The registered version, None for a URI pinned to a version, a run or
+        a file.
+    """
+    if not model_uri.startswith("models:/"):
+        return None
+    path = model_uri[len("models:/") :]
+    if "@" not in path:
+        name, _, stage = path.partition("/")
+        if not stage or stage.isdigit():
+            return None
+
+    import mlflow
+
+    client = mlflow.MlflowClient(tracking_uri=os.getenv("MLFLOW_TRACKING_URI"))
+    if "@" in path:
+        name, _, alias = path.partition("@")
+        return str(client.get_model_version_by_alias(name, alias).version)
+    stages = None if stage.lower() == "latest" else [stage]
+    versions = [version.version for version in client.get_latest_versions(name, stages)]
+    return max(versions, key=int, default=None)
+
+
+class ModelRegistry:
+    """
+    Keep the prediction models in memory for the life of the process.
+
+    The default model is the one served when no route is configured, the other
+    models are loaded by name next to it, e.g. from MODEL_URIS, to share the
+    traffic with it or to be scored in shadow.
+
+    A new model is always fully loaded before being swapped in, the swap itself is
+    a single reference assignment. Requests already running keep the reference to
+    the model they started with, so nothing is dropped during a reload.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any] = load_model,
+        resolver: Callable[[str], Optional[str]] = resolve_model_version,
+    ):
+        self._loader = loader
+        self._resolver = resolver
+        self._models: Dict[str, LoadedModel] = {}
+        self._version = 0
+        # MLFLOW_LOGGED_MODEL and the registered version it pointed to at the last
+        # load of the default model
+        self._watched_uri: Optional[str] = None
+        self._watched_version: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def current(self) -> LoadedModel:
+        """
+        Return the model currently served.
+
+        Raises:
+            ModelNotLoadedError: If no model has been loaded yet.
+        """
+        return self.get(DEFAULT_MODEL_NAME)
+
+    @property
+    def is_loaded(self) -> bool:
+        return DEFAULT_MODEL_NAME in self._models
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Names of the models currently loaded.
+        """
+        return list(self._models)
+
+    def get(self, name: str) -> LoadedModel:
+        """
+        Return a model by name.
+
+        Raises:
+            ModelNotLoadedError: If no model of this name has been loaded.
+        """
+        try:
+            return self._models[name]
+        except KeyError:
+            raise ModelNotLoadedError(f"Model {name!r} not loaded")
+
+    async def load_named(self, model_uris: Dict[str, str]):
+        """
+        Load the other models, a model that fails to load is logged and skipped.
+
+        Args:
+            model_uris (dict): The model URI or .npz artifact path of each name.
+        """
+        for name, model_uri in model_uris.items():
+            try:
+                await self.load(model_uri, name)
+            except Exception:
+                logger.exception("Model %s not loaded from %s", name, model_uri)
+
+    def unload(self, name: str) -> bool:
+        """
+        Drop a model other than the default one.
+
+        Returns:
+            bool: False if no model of this name was loaded.
+        """
+        if name == DEFAULT_MODEL_NAME:
+            raise ValueError("The default model cannot be unloaded")
+        return self._models.pop(name, None) is not None
+
+    async def load(
+        self, model_uri: Optional[str] = None, name: str = DEFAULT_MODEL_NAME
+    ) -> LoadedModel:
+        """
+        Load a model and swap it in once it is ready.
+
+        Args:
+            model_uri (str, optional): The model URI or .npz artifact path. By default
+                the artifact at INFERENCE_ARTIFACT_PATH if it exists, else
+                MLFLOW_LOGGED_MODEL, only for the default model.
+            name (str): Name of the model in the registry.
+
+        Returns:
+            LoadedModel: The model now served under this name.
+        """
+        if name != DEFAULT_MODEL_NAME and not model_uri:
+            raise ValueError(f"A model URI is required to load model {name!r}")
+        if not model_uri:
+            await self._watch_uri(os.getenv("MLFLOW_LOGGED_MODEL"))
+        if not model_uri and os.path.exists(INFERENCE_ARTIFACT_PATH):
+            # Local artifact first, MLflow stays the fallback
+            try:
+                return await self.load(INFERENCE_ARTIFACT_PATH)
+            except Exception:
+                logger.exception("Inference artifact not loaded, fallback to MLflow")
+        if not model_uri:
+            model_uri = os.getenv("MLFLOW_LOGGED_MODEL")
+        if not model_uri:
+            raise ValueError("No model URI given and MLFLOW_LOGGED_MODEL is not set")
+
+        # Only one load at a time, the loading itself runs outside the event loop
+        async with self._lock:
+            with span("model_load"):
+                model = await asyncio.to_thread(self._loader, model_uri)
+            self._version += 1
+            loaded_model = LoadedModel(
+                name=name,
+                uri=model_uri,
+                model=model,
+                version=self._version,
+                loaded_at=time.time(),
+                known_model_keys=ungrouped_model_keys(model),
+            )
+            self._models[name] = loaded_model
+
+        logger.info(
+            "Model %s loaded from %s (version %s)", name, model_uri, self._version
+        )
+        return loaded_model
+
+    async def reload_if_changed(self) -> Optional[LoadedModel]:
+        """
+        Load MLFLOW_LOGGED_MODEL again if the version it points to has changed.
+
+        Only an alias or stage URI can change, e.g. `models:/Ridge@production`
+        once another version of Ridge gets the alias. A model loaded explicitly
+        with another URI stays served until then.
+
+        Returns:
+            LoadedModel: The new model, or None if nothing changed.
+        """
+        if not self._watched_uri:
+            return None
+        version = await asyncio.to_thread(self._resolver, self._watched_uri)
+        if version is None or version == self._watched_version:
+            return None
+        previous_version, self._watched_version = self._watched_version, version
+        if previous_version is None:
+            # Not known at the load, e.g. the tracking server was unreachable
+            return None
+        logger.info("%s now points to version %s", self._watched_uri, version)
+        return await self.load(self._watched_uri)
+
+    async def _watch_uri(self, model_uri: Optional[str]):
+        self._watched_uri = model_uri
+        self._watched_version = None
+        if not model_uri:
+            return
+        try:
+            self._watched_version = await asyncio.to_thread(self._resolver, model_uri)
+        except Exception:
+            logger.exception("Version of %s not resolved", model_uri)
+
+    async def watch(self, interval: float = MODEL_RELOAD_INTERVAL):
+        """
+        Background task checking the version of MLFLOW_LOGGED_MODEL every
+        `interval` seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_if_changed()
+            except Exception:
+                # Keep serving the current model if the new one cannot be loaded
+                logger.exception("Model reload failed")
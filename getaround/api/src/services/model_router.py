@@ -0,0 +1,242 @@
+import bisect
+import os
+import random
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.services.metrics import ROUTED_PREDICTIONS, SHADOW_DEVIATION
+from src.services.model_registry import (
+    DEFAULT_MODEL_NAME,
+    LoadedModel,
+    ModelRegistry,
+    parse_assignments,
+)
+
+# Share of the /predict traffic of each model, e.g. "Ridge=0.8,XGBoost=0.2"
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+# Candidate model scoring the batches of the served models, without answering
+MODEL_SHADOW = os.getenv("MODEL_SHADOW") or None
+# Share of the batches also scored by the shadow model
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "1"))
+
+
+@dataclass
+class ShadowStats:
+    """
+    Comparison of the shadow model with the models it shadows.
+
+    Attributes:
+        batches (int): Batches scored by the shadow model.
+        rows (int): Cars scored by the shadow model.
+        skipped (int): Batches not scored because no executor worker was idle.
+        errors (int): Batches the shadow model failed to score.
+        served_seconds (float): Total predict time of the served models on these batches.
+        shadow_seconds (float): Total predict time of the shadow model on these batches.
+        deviation_sum (float): Sum of shadow - served over the rows.
+        absolute_deviation_sum (float): Sum of |shadow - served| over the rows.
+        max_absolute_deviation (float): Largest |shadow - served|.
+    """
+
+    batches: int = 0
+    rows: int = 0
+    skipped: int = 0
+    errors: int = 0
+    served_seconds: float = 0.0
+    shadow_seconds: float = 0.0
+    deviation_sum: float = 0.0
+    absolute_deviation_sum: float = 0.0
+    max_absolute_deviation: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "mean_served_ms": (
+                1000 * self.served_seconds / self.batches if self.batches else 0.0
+            ),
+            "mean_shadow_ms": (
+                1000 * self.shadow_seconds / self.batches if self.batches else 0.0
+            ),
+            "mean_deviation": self.deviation_sum / self.rows if self.rows else 0.0,
+            "mean_absolute_deviation": (
+                self.absolute_deviation_sum / self.rows if self.rows else 0.0
+            ),
+            "max_absolute_deviation": self.max_absolute_deviation,
+        }
+
+
+class ModelRouter:
+    """
+    Split the /predict traffic between the loaded models by weight.
+
+    Each request draws its model among the routed models currently loaded, with
+    probabilities proportional to their weights. Without any route, or when none
+    of the routed models is loaded, the default model serves everything.
+
+    A shadow model may also be set: the prediction batcher scores a sample of the
+    batches of the other models with it in the background, and the router records
+    its latency and its deviation from the served predictions. The shadow model
+    never answers a request, unless it is also routed.
+
+    It is only used from the event loop, so it needs no lock.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        routes: Optional[Dict[str, float]] = None,
+        shadow: Optional[str] = MODEL_SHADOW,
+        shadow_sample_rate: float = SHADOW_SAMPLE_RATE,
+    ):
+        self.registry = registry
+        self.routes: Dict[str, float] = {}
+        self.shadow: Optional[str] = None
+        self.shadow_sample_rate = shadow_sample_rate
+        self.configure(
+            routes if routes is not None else parse_assignments(MODEL_ROUTES, float),
+            shadow,
+        )
+
+        # Metrics
+        self.routed: Counter = Counter()
+        self.shadow_stats: Dict[str, ShadowStats] = {}
+
+    def configure(self, routes: Dict[str, float], shadow: Optional[str] = None):
+        """
+        Replace the routes and the shadow model.
+
+        The models do not need to be loaded yet, a route is only used once its
+        model is.
+
+        Args:
+            routes (dict): Weight of each model name, an empty dict routes everything
+                to the default model.
+            shadow (str, optional): Name of the shadow model, None to disable it.
+
+        Raises:
+            ValueError: If a weight is negative or all of them are 0.
+        """
+        if any(weight < 0 for weight in routes.values()):
+            raise ValueError("Route weights must be positive")
+        if routes and not sum(routes.values()):
+            raise ValueError("At least one route weight must be above 0")
+        self.routes = dict(routes)
+        self.shadow = shadow
+
+    def choose(self) -> LoadedModel:
+        """
+        Draw the model serving a request.
+
+        Returns:
+            LoadedModel: A routed model, or the default model.
+
+        Raises:
+            ModelNotLoadedError: If no routed model is loaded, nor the default one.
+        """
+        names, cumulative_weights, total = [], [], 0.0
+        for name, weight in self.routes.items():
+            if weight > 0 and name in self.registry.names:
+                total += weight
+                names.append(name)
+                cumulative_weights.append(total)
+
+        if names:
+            index = bisect.bisect_right(cumulative_weights, random.random() * total)
+            loaded_model = self.registry.get(names[min(index, len(names) - 1)])
+        else:
+            loaded_model = self.registry.current
+
+        self.routed[loaded_model.name] += 1
+        ROUTED_PREDICTIONS.labels(loaded_model.name).inc()
+        return loaded_model
+
+    def shadow_model(self, served_name: str) -> Optional[LoadedModel]:
+        """
+        Return the shadow model for a batch served by another model, if any.
+
+        Returns:
+            LoadedModel: The shadow model, or None if there is none, it is not
+            loaded, it served the batch itself or the batch is not sampled.
+        """
+        if self.shadow is None or self.shadow == served_name:
+            return None
+        if self.shadow not in self.registry.names:
+            return None
+        if random.random() >= self.shadow_sample_rate:
+            return None
+        return self.registry.get(self.shadow)
+
+    def record_shadow(
+        self,
+        shadow_name: str,
+        served_predictions,
+        shadow_predictions,
+        served_seconds: float,
+        shadow_seconds: float,
+    ):
+        """
+        Record the comparison of the shadow model with the served predictions.
+
+        Args:
+            shadow_name (str): Name of the shadow model.
+            served_predictions (np.ndarray): Predictions returned to the clients.
+            shadow_predictions (np.ndarray): Predictions of the shadow model.
+            served_seconds (float): Predict time of the served model.
+            shadow_seconds (float): Predict time of the shadow model.
+        """
+        deviations = np.asarray(shadow_predictions, dtype=float) - np.asarray(
+            served_predictions, dtype=float
+        )
+        absolute_deviations = np.abs(deviations)
+        for deviation in absolute_deviations.tolist():
+            SHADOW_DEVIATION.labels(shadow_name).observe(deviation)
+
+        stats = self._stats(shadow_name)
+        stats.batches += 1
+        stats.rows += len(deviations)
+        stats.served_seconds += served_seconds
+        stats.shadow_seconds += shadow_seconds
+        stats.deviation_sum += float(deviations.sum())
+        stats.absolute_deviation_sum += float(absolute_deviations.sum())
+        stats.max_absolute_deviation = max(
+            stats.max_absolute_deviation, float(absolute_deviations.max())
+        )
+
+    def record_shadow_skipped(self, shadow_name: str):
+        self._stats(shadow_name).skipped += 1
+
+    def record_shadow_error(self, shadow_name: str):
+        self._stats(shadow_name).errors += 1
+
+    def stats(self) -> dict:
+        """
+        Return the routes, the loaded models and the shadow comparison.
+
+        Returns:
+            dict: Loaded models, routes, requests routed to each model, shadow model
+            and its comparison with the served models.
+        """
+        return {
+            "models": {
+                name: {
+                    "model_uri": self.registry.get(name).uri,
+                    "version": self.registry.get(name).version,
+                }
+                for name in self.registry.names
+            },
+            "routes": self.routes or {DEFAULT_MODEL_NAME: 1.0},
+            "routed": dict(self.routed),
+            "shadow": self.shadow,
+            "shadow_sample_rate": self.shadow_sample_rate,
+            "shadow_stats": {
+                name: stats.to_dict() for name, stats in self.shadow_stats.items()
+            },
+        }
+
+    def _stats(self, shadow_name: str) -> ShadowStats:
+        return self.shadow_stats.setdefault(shadow_name, ShadowStats())
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+
+from src.services.executor import (
+    BoundedExecutor,
+    ExecutorSaturatedError,
+    record_queue_time,
+)
+from src.services.feature_encoder import EncodedRow, FeatureEncoder
+from src.services.metrics import MODEL_PREDICT_DURATION, span
+from src.services.model_registry import (
+    DEFAULT_MODEL_NAME,
+    LoadedModel,
+    ModelRegistry,
+    PredictionInputError,
+)
+from src.services.model_router import ModelRouter
+
+logger = logging.getLogger(__name__)
+
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+# Predictions waiting for a batch, beyond that new ones are rejected
+PREDICT_MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "1024"))
+
+
+class PredictionBatcher:
+    """
+    Coalesce concurrent single-car predictions into one call of the model.
+
+    Each request puts its encoded input row in a queue, with the name of the
+    model routed to it, and waits on a future. A background task takes the first
+    waiting row, then gathers the following ones for at most `max_wait_ms`
+    milliseconds or until `max_batch_size` rows, runs each model once on its own
+    rows and resolves every future with its own result. When the model rejects
+    the values of a car, the batch is bisected so that only the requests of the
+    rejected cars fail. At most `max_queue` rows
+    may wait, beyond that new predictions are rejected with
+    ExecutorSaturatedError, as the executor does, instead of piling up.
+
+    The models run in the executor, so several batches may be in progress at once.
+    When the router has a shadow model, it scores the same rows afterwards, only
+    if an executor worker is idle, and never delays the answers.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        executor: BoundedExecutor,
+        router: Optional[ModelRouter] = None,
+        max_batch_size: int = PREDICT_MAX_BATCH_SIZE,
+        max_wait_ms: float = PREDICT_MAX_WAIT_MS,
+        max_queue: int = PREDICT_MAX_QUEUE,
+    ):
+        self.registry = registry
+        self.executor = executor
+        self.router = router
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.max_queue = max(1, max_queue)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._flushes = set()
+        self._shadow_tasks = set()
+
+        # Metrics
+        self.requests_total = 0
+        self.rejected_total = 0
+        self.batches_total = 0
+        self.batched_requests_total = 0
+        self.batch_sizes: Counter = Counter()
+
+    def start(self):
+        """
+        Start the background task gathering the batches.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background task and fail the predictions still waiting.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for task in list(self._shadow_tasks):
+            task.cancel()
+
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction batcher stopped"))
+
+    async def predict(self, row: EncodedRow, model_name: str = DEFAULT_MODEL_NAME):
+        """
+        Queue one encoded input row and wait for its prediction.
+
+        Args:
+            row (tuple): The car encoded by FeatureEncoder.encode_record.
+            model_name (str): Name of the model to run, in the registry.
+
+        Returns:
+            The prediction for this row.
+
+        Raises:
+            ExecutorSaturatedError: If `max_queue` predictions are already waiting.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((model_name, row, future))
+        except asyncio.QueueFull:
+            self.rejected_total += 1
+            raise ExecutorSaturatedError("Too many predictions waiting")
+        self.requests_total += 1
+        prediction, queue_time = await future
+        record_queue_time(queue_time)
+        return prediction
+
+    def stats(self) -> dict:
+        """
+        Return the batcher metrics.
+
+        Returns:
+            dict: Queue depth, number of requests, rejected requests and batches,
+            and the batch sizes distribution.
+        """
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "requests_total": self.requests_total,
+            "rejected_total": self.rejected_total,
+            "batches_total": self.batches_total,
+            "mean_batch_size": (
+                self.batched_requests_total / self.batches_total
+                if self.batches_total
+                else 0.0
+            ),
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # One call of each model on its own rows
+            batches = defaultdict(list)
+            for model_name, row, future in batch:
+                batches[model_name].append((row, future))
+            for model_name, model_batch in batches.items():
+                flush = asyncio.create_task(self._flush(model_name, model_batch))
+                self._flushes.add(flush)
+                flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(
+        self, model_name: str, batch: List[Tuple[EncodedRow, asyncio.Future]]
+    ):
+        # Drop the requests cancelled while waiting in the queue
+        batch = [(row, future) for row, future in batch if not future.done()]
+        if not batch:
+            return
+
+        self.batches_total += 1
+        self.batched_requests_total += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+        try:
+            # Same model for the whole batch, even if a reload happens meanwhile
+            loaded_model = self.registry.get(model_name)
+        except Exception as e:
+            _fail(batch, e)
+            return
+        await self._resolve_batch(loaded_model, batch)
+
+    async def _resolve_batch(
+        self, loaded_model: LoadedModel, batch: List[Tuple[EncodedRow, asyncio.Future]]
+    ):
+        rows = [row for row, _ in batch]
+        try:
+            (predictions, seconds), queue_time = await self.executor.run_timed(
+                _predict_rows, loaded_model, rows
+            )
+        except PredictionInputError as e:
+            if len(batch) == 1:
+                _fail(batch, e)
+                return
+            # Bisect the batch, only the requests of the rejected cars fail
+            middle = len(batch) // 2
+            await asyncio.gather(
+                self._resolve_batch(loaded_model, batch[:middle]),
+                self._resolve_batch(loaded_model, batch[middle:]),
+            )
+            return
+        except Exception as e:
+            _fail(batch, e)
+            return
+
+        for (_, future), prediction in zip(batch, predictions.tolist()):
+            if not future.done():
+                future.set_result((prediction, queue_time))
+
+        if self.router is not None:
+            self._shadow(loaded_model, rows, predictions, seconds)
+
+    def _shadow(self, served_model: LoadedModel, rows, predictions, seconds: float):
+        shadow_model = self.router.shadow_model(served_model.name)
+        if shadow_model is None:
+            return
+        # The shadow model only gets the spare capacity of the executor
+        if not self.executor.idle_workers:
+            self.router.record_shadow_skipped(shadow_model.name)
+            return
+        task = asyncio.create_task(
+            self._score_shadow(shadow_model, rows, predictions, seconds)
+        )
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _score_shadow(
+        self, shadow_model: LoadedModel, rows, served_predictions, served_seconds
+    ):
+        try:
+            (predictions, seconds), _ = await self.executor.run_timed(
+                _predict_rows, shadow_model, rows, "shadow"
+            )
+        except Exception:
+            logger.exception("Shadow model %s failed", shadow_model.name)
+            self.router.record_shadow_error(shadow_model.name)
+            return
+        self.router.record_shadow(
+            shadow_model.name,
+            served_predictions,
+            predictions,
+            served_seconds,
+            seconds,
+        )
+
+
+def _fail(batch: List[Tuple[EncodedRow, asyncio.Future]], error: Exception):
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+def _predict_rows(loaded_model, rows: List[EncodedRow], role: str = "served"):
+    with span("to_frame"):
+        df = FeatureEncoder.to_frame(rows)
+    start = time.perf_counter()
+    with span("model_predict" if role == "served" else "shadow_predict"):
+        predictions = loaded_model.predict(df)
+    seconds = time.perf_counter() - start
+    MODEL_PREDICT_DURATION.labels(loaded_model.name, role).observe(seconds)
+    return predictions, seconds
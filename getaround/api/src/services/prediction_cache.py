@@ -0,0 +1,136 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.services.feature_encoder import EncodedRow
+from src.services.metrics import PREDICTION_CACHE_LOOKUPS
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600"))
+
+
+class PredictionCache:
+    """
+    LRU cache of the single-car predictions, with a time to live.
+
+    The key is the car encoded by FeatureEncoder.encode_record: the cast and
+    lower-cased values in the fixed order of FEATURES, so two requests for the
+    same car share their entry whatever the case or the field order of their JSON.
+    Entries are also keyed by the name of the model, and belong to one version of
+    it: all the entries of a model are dropped as soon as a lookup sees another
+    version of that model.
+
+    It is only used from the event loop, so it needs no lock. A size of 0
+    disables it.
+    """
+
+    def __init__(
+        self,
+        max_size: int = PREDICTION_CACHE_SIZE,
+        ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max(0, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, EncodedRow], Tuple[Any, float]]" = (
+            OrderedDict()
+        )
+        self._model_versions: Dict[str, int] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(
+        self, row: EncodedRow, model_name: str, model_version: int
+    ) -> Optional[Any]:
+        """
+        Look up the prediction of a car for a model version.
+
+        Args:
+            row (tuple): The car encoded by FeatureEncoder.encode_record.
+            model_name (str): Name of the model routed to the request.
+            model_version (int): Version of this model currently loaded.
+
+        Returns:
+            The cached prediction, or None if it is missing or expired.
+        """
+        if not self.max_size:
+            return None
+        if model_version != self._model_versions.get(model_name):
+            self.invalidate(model_name)
+            self._model_versions[model_name] = model_version
+
+        key = (model_name, row)
+        entry = self._entries.get(key)
+        if entry is not None:
+            prediction, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                PREDICTION_CACHE_LOOKUPS.labels("hit").inc()
+                return prediction
+            del self._entries[key]
+            self.expirations += 1
+
+        self.misses += 1
+        PREDICTION_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    def put(
+        self, row: EncodedRow, model_name: str, model_version: int, prediction: Any
+    ):
+        """
+        Store the prediction of a car, evicting the least recently used entries.
+
+        The prediction is ignored if the model changed while it was computed.
+        """
+        if not self.max_size or model_version != self._model_versions.get(model_name):
+            return
+        key = (model_name, row)
+        self._entries[key] = (prediction, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, model_name: Optional[str] = None):
+        """
+        Drop the entries of a model, or all the entries.
+        """
+        if model_name is None:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            return
+        # Only on a reload, the scan of the keys is cheap next to the model load
+        keys = [key for key in self._entries if key[0] == model_name]
+        if keys:
+            self.invalidations += 1
+        for key in keys:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        """
+        Return the cache metrics.
+
+        Returns:
+            dict: Size, hits, misses, hit ratio, expirations, evictions and
+            invalidations.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "model_versions": dict(self._model_versions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
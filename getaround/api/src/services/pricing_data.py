@@ -0,0 +1,180 @@
+"""
+Typed access to the pricing dataset, shared by the API, the trainer and the notebooks.
+
+Only depends on pandas and pyarrow, so it can be imported from the getaround
+directory as `api.src.services.pricing_data` as well as from the API.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Typed columns of the pricing dataset, parsed once instead of re-infered on each call
+PRICING_DTYPES = {
+    "Unnamed: 0": "int32",
+    "model_key": "category",
+    "mileage": "int32",
+    "engine_power": "int32",
+    "fuel": "category",
+    "paint_color": "category",
+    "car_type": "category",
+    "private_parking_available": "bool",
+    "has_gps": "bool",
+    "has_air_conditioning": "bool",
+    "automatic_car": "bool",
+    "has_getaround_connect": "bool",
+    "has_speed_regulator": "bool",
+    "winter_tires": "bool",
+    "rental_price_per_day": "int32",
+}
+
+# Directory of the caches, next to each CSV by default
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR")
+
+CACHE_FORMAT_VERSION = 1
+
+
+def load_pricing_dataset(path: str, cache_dir: Optional[str] = DATASET_CACHE_DIR):
+    """
+    Load the pricing CSV with its typed columns, through the columnar cache.
+
+    Args:
+        path (str): The pricing CSV.
+        cache_dir (str, optional): Directory of the cache, next to the CSV by default.
+
+    Returns:
+        pd.DataFrame: The typed dataset.
+    """
+    return read_csv_cached(path, PRICING_DTYPES, cache_dir)
+
+
+def read_csv_cached(
+    path: str, dtypes: Dict[str, str], cache_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Read a CSV through a typed Feather cache, rebuilt when the CSV changes.
+
+    The first load parses the CSV with its dtypes, categories included, and writes
+    it as an uncompressed Feather (Arrow IPC) file. The following loads
+    memory-map that file instead of parsing the text again. The cache is rebuilt
+    when the SHA-256 of the CSV or the requested dtypes change; the checksum
+    itself is only computed again when the size or the modification time of the
+    CSV change.
+
+    If the cache cannot be written, e.g. on a read-only file system, the parsed
+    CSV is returned as is.
+
+    Args:
+        path (str): The CSV file.
+        dtypes (dict): dtype of the columns, the ones missing from the file are ignored.
+        cache_dir (str, optional): Directory of the cache, next to the CSV by default.
+
+    Returns:
+        pd.DataFrame: The typed content of the CSV.
+    """
+    stat = os.stat(path)
+    cache_path, meta_path = _cache_paths(path, cache_dir)
+    meta = _read_meta(meta_path)
+    # As stored in the JSON metadata
+    dtypes = {column: str(dtype) for column, dtype in dtypes.items()}
+
+    if meta is not None and meta.get("dtypes") == dtypes and os.path.exists(cache_path):
+        if (meta["size"], meta["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return _read_cache(cache_path)
+        checksum = file_checksum(path)
+        if meta["checksum"] == checksum:
+            # Touched but not modified, only the stat is out of date
+            _write_meta(meta_path, {**meta, **_stat_meta(stat)})
+            return _read_cache(cache_path)
+    else:
+        checksum = file_checksum(path)
+
+    frame = _parse_csv(path, dtypes)
+    try:
+        _write_cache(frame, cache_path)
+        _write_meta(
+            meta_path,
+            {
+                "format_version": CACHE_FORMAT_VERSION,
+                "checksum": checksum,
+                "dtypes": dtypes,
+                **_stat_meta(stat),
+            },
+        )
+    except OSError:
+        logger.warning("Columnar cache of %s not written", path, exc_info=True)
+    return frame
+
+
+def file_checksum(path: str) -> str:
+    """
+    SHA-256 of a file, read by blocks of 1 MiB.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(path: str, cache_dir: Optional[str]):
+    directory = cache_dir or os.path.join(
+        os.path.dirname(os.path.abspath(path)), ".cache"
+    )
+    name = os.path.basename(path)
+    return (
+        os.path.join(directory, f"{name}.arrow"),
+        os.path.join(directory, f"{name}.json"),
+    )
+
+
+def _parse_csv(path: str, dtypes: Dict[str, str]) -> pd.DataFrame:
+    columns = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(
+        path,
+        dtype={column: dtype for column, dtype in dtypes.items() if column in columns},
+    )
+
+
+def _read_cache(cache_path: str) -> pd.DataFrame:
+    from pyarrow import feather
+
+    table = feather.read_table(cache_path, memory_map=True)
+    # Numeric columns without missing values stay views of the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def _write_cache(frame: pd.DataFrame, cache_path: str):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Written aside then renamed, a concurrent reader never sees a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    frame.to_feather(tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+
+
+def _read_meta(meta_path: str) -> Optional[dict]:
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != CACHE_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def _write_meta(meta_path: str, meta: dict):
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, meta_path)
+
+
+def _stat_meta(stat: os.stat_result) -> dict:
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
@@ -0,0 +1,118 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_THRESHOLD_MS = float(os.getenv("PROFILER_THRESHOLD_MS", "200"))
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "/tmp/getaround-profiles")
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "20"))
+
+
+class ProfilerUnavailableError(Exception):
+    """Raised when the profiler is enabled but pyinstrument is not installed."""
+
+
+class RequestProfiler:
+    """
+    Sampling profiler of the slow requests, toggled at runtime.
+
+    When enabled, requests are profiled with pyinstrument, one at a time, and the
+    profile of a request slower than the threshold is written as HTML to the
+    output directory. Only the last `max_profiles` profiles are kept. Disabled,
+    it costs a boolean check per request.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PROFILER_ENABLED,
+        threshold_ms: float = PROFILER_THRESHOLD_MS,
+        output_dir: str = PROFILER_OUTPUT_DIR,
+        max_profiles: int = PROFILER_MAX_PROFILES,
+    ):
+        self.enabled = False
+        self.threshold_ms = threshold_ms
+        self.output_dir = output_dir
+        self.max_profiles = max_profiles
+        self.profiles: Deque[str] = deque()
+        self.saved_total = 0
+        self._profiling = False
+        if enabled:
+            try:
+                self.configure(enabled=True)
+            except ProfilerUnavailableError:
+                logger.warning("PROFILER_ENABLED is set but pyinstrument is missing")
+
+    def configure(
+        self, enabled: Optional[bool] = None, threshold_ms: Optional[float] = None
+    ):
+        """
+        Enable or disable the profiler and change its threshold.
+
+        Raises:
+            ProfilerUnavailableError: If it is enabled without pyinstrument.
+        """
+        if enabled:
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ProfilerUnavailableError("pyinstrument is not installed")
+            os.makedirs(self.output_dir, exist_ok=True)
+        if enabled is not None:
+            self.enabled = enabled
+        if threshold_ms is not None:
+            self.threshold_ms = threshold_ms
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "output_dir": self.output_dir,
+            "profiles": list(self.profiles),
+        }
+
+    async def __call__(self, request: Request, call_next):
+        # pyinstrument samples one async context per thread, the other requests
+        # go through while a request is being profiled
+        if not self.enabled or self._profiling:
+            return await call_next(request)
+
+        from pyinstrument import Profiler
+
+        self._profiling = True
+        profiler = Profiler(async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            return await call_next(request)
+        finally:
+            profiler.stop()
+            self._profiling = False
+            duration_ms = 1000 * (time.perf_counter() - start)
+            if duration_ms >= self.threshold_ms:
+                self._save(request, profiler, duration_ms)
+
+    def _save(self, request: Request, profiler, duration_ms: float):
+        self.saved_total += 1
+        name = "{}_{}_{}_{}_{:.0f}ms.html".format(
+            time.strftime("%Y%m%dT%H%M%S"),
+            self.saved_total,
+            request.method,
+            request.url.path.strip("/").replace("/", "-"),
+            duration_ms,
+        )
+        path = os.path.join(self.output_dir, name)
+        with open(path, "w") as file:
+            file.write(profiler.output_html())
+        logger.info("Slow request profiled in %s", path)
+
+        self.profiles.append(path)
+        while len(self.profiles) > self.max_profiles:
+            old_path = self.profiles.popleft()
+            if os.path.exists(old_path):
+                os.remove(old_path)
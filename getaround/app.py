@@ -1,33 +1,25 @@
 import os
 
-import numpy as np
 import pandas as pd
-from sklearn.base import BaseEstimator, TransformerMixin
-import xgboost as xgb
 from dotenv import load_dotenv
-from sklearn.compose import ColumnTransformer
-from sklearn.discriminant_analysis import StandardScaler
-from sklearn.ensemble import (
-    GradientBoostingRegressor,
-    RandomForestRegressor,
-)
-from sklearn.linear_model import Lasso, LinearRegression, Ridge
-from sklearn.metrics import root_mean_squared_error, r2_score
-from sklearn.model_selection import cross_val_score, train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
 
 import mlflow
 from mlflow.models.signature import infer_signature
 
-
-class LowercaseTransformer(BaseEstimator, TransformerMixin):
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X, y=None):
-        return X.apply(lambda x: x.str.lower() if x.dtype == "object" else x)
-
+# Module autonome de l'API, partagé avec l'entraînement et les notebooks
+from api.src.services.pricing_data import load_pricing_dataset
+from training.candidates import (
+    CATEGORICAL_FEATURES,
+    NUMERIC_FEATURES,
+    SEARCH_SPACES,
+    build_models,
+    build_preprocessor,
+    prepare_dataset,
+)
+from training.experiments import run_experiments
+from training.export import export_pipeline
+from training.search import load_search_spaces, successive_halving
+from training.streaming import train_streaming
 
 if __name__ == "__main__":
     print("getaround price prediction")
@@ -39,6 +31,10 @@ if __name__ == "__main__":
     MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
     print(f"Call MLflow URI: {MLFLOW_TRACKING_URI}")
     EXPERIMENT_NAME = "jedha-getaround-price-prediction"
+    # Flat inference artifact of the best model, loaded by the API from its image
+    INFERENCE_ARTIFACT_PATH = os.getenv(
+        "INFERENCE_ARTIFACT_PATH", "./api/src/artifacts/pricing_model.npz"
+    )
 
     mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     mlflow.set_experiment(EXPERIMENT_NAME)
@@ -46,155 +42,153 @@ if __name__ == "__main__":
     # Get our experiment info
     experiment = mlflow.get_experiment_by_name(EXPERIMENT_NAME)
 
-    # Load data
-    dataset_path = "./data/get_around_pricing_project.csv"
-    rawdata = pd.read_csv(dataset_path)
+    # "search" : recherche des hyperparamètres en mémoire
+    # "evaluation" : évaluation complète des modèles de base, en validation croisée
+    # "streaming" : entraînement incrémental par blocs, pour un CSV trop gros pour la RAM
+    TRAINING_MODE = os.getenv("TRAINING_MODE", "search")
 
-    # Prepare data
-    dataset = rawdata.drop(columns=["Unnamed: 0"])
-    car_type_counts = dataset["car_type"].value_counts()
-    car_type_percentages = (car_type_counts / len(dataset) * 100).round(2)
-    model_car_counts = dataset["model_key"].value_counts()
-    model_car_percentages = (model_car_counts / len(dataset) * 100).round(2)
-    # Regroupement des données model_key et car_type ayant peu de données
-    car_type_counts = dataset["car_type"].value_counts(normalize=True).mul(100).round(2)
-    car_type_mask = car_type_counts > 5.0
-    dataset["car_type"] = dataset["car_type"].apply(
-        lambda x: x if car_type_mask[x] else "other"
-    )
-    model_key_counts = (
-        dataset["model_key"].value_counts(normalize=True).mul(100).round(2)
-    )
-    model_key_mask = model_key_counts > 1.0
-    dataset["model_key"] = dataset["model_key"].apply(
-        lambda x: x if model_key_mask[x] else "other"
+    # Load data, only a sample in streaming mode, the CSV is then read by chunks
+    dataset_path = os.getenv(
+        "TRAINING_DATASET_PATH", "./data/get_around_pricing_project.csv"
     )
+    if TRAINING_MODE == "streaming":
+        rawdata = pd.read_csv(dataset_path, nrows=1000)
+    else:
+        # Cache typé Feather, le CSV n'est reparsé que lorsque son contenu change
+        rawdata = load_pricing_dataset(dataset_path)
+
+    # Prepare data
+    dataset = prepare_dataset(rawdata)
 
     # Create the model
-    numeric_features = [
-        "mileage",
-        "engine_power",
-        "private_parking_available",
-        "has_gps",
-        "has_air_conditioning",
-        "automatic_car",
-        "has_getaround_connect",
-        "has_speed_regulator",
-        "winter_tires",
-    ]
-    categorical_features = ["model_key", "fuel", "paint_color", "car_type"]
+    numeric_features = NUMERIC_FEATURES
+    categorical_features = CATEGORICAL_FEATURES
 
     # Preprocessing
-    # Transform also cat var to lowercase
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("num", StandardScaler(), numeric_features),
-            (
-                "cat",
-                Pipeline(
-                    steps=[
-                        ("lowercase", LowercaseTransformer()),
-                        ("onehot", OneHotEncoder()),
-                    ]
-                ),
-                categorical_features,
-            ),
-        ]
+    preprocessor = build_preprocessor()
+
+    # Modèles de base, leurs hyperparamètres sont ensuite recherchés dans SEARCH_SPACES
+    models = build_models()
+    search_space_path = os.getenv("TRAINING_SEARCH_SPACE")
+    search_spaces = (
+        load_search_spaces(search_space_path, SEARCH_SPACES)
+        if search_space_path
+        else SEARCH_SPACES
     )
 
-    models = {
-        "Linear Regression": LinearRegression(),
-        "Ridge": Ridge(alpha=1.5),
-        "Lasso": Lasso(alpha=0.6),
-        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
-        "Gradient Boosting": GradientBoostingRegressor(
-            n_estimators=100, random_state=42
-        ),
-        "XGBoost": xgb.XGBRegressor(n_estimators=100, random_state=42),
-    }
-
     # Enable mlflow autolog
     mlflow.sklearn.autolog(disable=True)
     # mlflow.autolog(disable=True)
 
-    def evaluate_regression_models(
-        X, y, scoring="r2", test_size=0.2, random_state=42, n_jobs=1
-    ):
-        # Split des données
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state
+    def log_experiment(result):
+        """
+        Log the result of a model to MLflow, as soon as all its fits are done.
+        """
+        pipeline = result.pipeline
+
+        # Prédiction sur un échantillon de données
+        # La signature décrit le JSON reçu par l'API : entiers 64 bits et chaînes
+        sample_data = X[:1].astype(
+            {
+                column: "int64" if pd.api.types.is_integer_dtype(dtype) else object
+                for column, dtype in X.dtypes.items()
+                if pd.api.types.is_integer_dtype(dtype)
+                or isinstance(dtype, pd.CategoricalDtype)
+            }
         )
-
-        for model_name, model in models.items():
-            # Création du pipeline
-            pipeline = Pipeline([("preprocessor", preprocessor), ("regressor", model)])
-
-            # Entraînement
-            pipeline.fit(X_train, y_train)
-
-            # Prédictions
-            y_pred = pipeline.predict(X_test)
-
-            # Calcul des métriques
-            rmse_value = root_mean_squared_error(y_test, y_pred)
-            r2_value = r2_score(y_test, y_pred)
-            mae_value = np.mean(np.abs(y_test - y_pred))
-
-            # Cross-validation
-            cv_scores = cross_val_score(
-                pipeline, X, y, cv=10, scoring=scoring, n_jobs=n_jobs
+        sample_prediction = pipeline.predict(sample_data)
+
+        # Log experiment to MLFlow
+        with mlflow.start_run(experiment_id=experiment.experiment_id) as run:
+            mlflow.log_param("dataset_path", dataset_path)
+
+            # mlflow.log_input(mlflow.data.dataset.Dataset(dataset_path))
+            mlflow.log_param("Datasets used", dataset_path)
+
+            # Log des résultats
+            print(f"\n{result.model_name}: r2={result.r2_score:.4f}")
+            # Log Params
+            mlflow.log_param("random_state", random_state)
+            mlflow.log_param("n_jobs", n_jobs)
+            mlflow.log_param("test_size", test_size)
+            mlflow.log_params(result.params)
+            # Log Metrics
+            mlflow.log_metric("rmse", result.rmse)
+            mlflow.log_metric("mae", result.mae)
+            mlflow.log_metric("r2_score", result.r2_score)
+            if len(result.cv_scores):
+                mlflow.log_metric("cv_mean", result.cv_scores.mean())
+                mlflow.log_metric("cv_std", result.cv_scores.std())
+            mlflow.log_metric("fit_seconds", result.fit_seconds)
+
+            # Log the sklearn model and register as version
+            mlflow.sklearn.log_model(
+                sk_model=pipeline,  # Note: model should be the trained instance
+                artifact_path=EXPERIMENT_NAME,
+                registered_model_name=result.model_name,
+                # The custom transformers are shipped with the model
+                code_paths=["training"],
+                signature=infer_signature(
+                    sample_data,
+                    sample_prediction.tolist(),
+                ),
             )
 
-            # Prédiction sur un échantillon de données
-            sample_data = (
-                X_test.iloc[0].to_frame().T
-            )  # Prendre la première ligne de X_test comme échantillon
-            sample_prediction = pipeline.predict(sample_data)
-
-            # Log experiment to MLFlow
-            with mlflow.start_run(experiment_id=experiment.experiment_id) as run:
-                mlflow.log_param("dataset_path", dataset_path)
-
-                # mlflow.log_input(mlflow.data.dataset.Dataset(dataset_path))
-                mlflow.log_param("Datasets used", dataset_path)
-
-                # Log des résultats
-                print(f"\n{model}:")
-                # Log Params
-                mlflow.log_param("random_state", random_state)
-                mlflow.log_param("n_jobs", n_jobs)
-                mlflow.log_param("test_size", test_size)
-                # Log Metrics
-                mlflow.log_metric("rmse", rmse_value)
-                mlflow.log_metric("mae", mae_value)
-                mlflow.log_metric("r2_score", r2_value)
-                mlflow.log_metric("cv_mean", cv_scores.mean())
-                mlflow.log_metric("cv_std", cv_scores.std())
-
-                # Log the sklearn model and register as version
-                mlflow.sklearn.log_model(
-                    sk_model=pipeline,  # Note: model should be the trained instance
-                    artifact_path=EXPERIMENT_NAME,
-                    registered_model_name=model_name,
-                    signature=infer_signature(
-                        X[:1],
-                        sample_prediction.tolist(),
-                    ),
-                )
-
-
-# Preprocess data
-# Separate features and target
-X = dataset[numeric_features + categorical_features]
-y = dataset["rental_price_per_day"]
-
-# Évaluation des modèles
-test_size = 0.2
-random_state = 42
-n_jobs = -1
-evaluate_regression_models(
-    X, y, test_size=test_size, random_state=random_state, n_jobs=n_jobs
-)
+    # Preprocess data
+    # Separate features and target
+    X = dataset[numeric_features + categorical_features]
+    y = dataset["rental_price_per_day"]
+
+    test_size = 0.2
+    random_state = 42
+    n_jobs = int(os.getenv("TRAINING_N_JOBS", "-1"))
+    if TRAINING_MODE == "streaming":
+        # Mémoire bornée par la taille des blocs, quelle que soit la taille du CSV
+        n_jobs = 1
+        result = train_streaming(
+            dataset_path,
+            chunksize=int(os.getenv("TRAINING_CHUNK_SIZE", "100000")),
+            epochs=int(os.getenv("TRAINING_EPOCHS", "5")),
+            validation_fraction=test_size,
+            random_state=random_state,
+        )
+        log_experiment(result)
+        results = [result]
+    elif TRAINING_MODE == "evaluation":
+        # Tous les modèles de base, chacun en validation croisée sur tout le dataset
+        results = list(
+            run_experiments(
+                models,
+                preprocessor,
+                X,
+                y,
+                on_result=log_experiment,
+                cv=int(os.getenv("TRAINING_CV_FOLDS", "10")),
+                test_size=test_size,
+                random_state=random_state,
+                n_jobs=n_jobs,
+            ).values()
+        )
+    else:
+        # Recherche des hyperparamètres par successive halving, seuls les survivants
+        # sont évalués sur le jeu de test et enregistrés dans MLflow
+        results = successive_halving(
+            models,
+            preprocessor,
+            X,
+            y,
+            search_spaces,
+            on_result=log_experiment,
+            n_candidates=int(os.getenv("TRAINING_SEARCH_CANDIDATES", "9")),
+            test_size=test_size,
+            random_state=random_state,
+            n_jobs=n_jobs,
+        )
 
+    # Export du meilleur modèle pour l'API
+    best_result = max(results, key=lambda result: result.r2_score)
+    os.makedirs(os.path.dirname(INFERENCE_ARTIFACT_PATH), exist_ok=True)
+    export_pipeline(best_result.pipeline, INFERENCE_ARTIFACT_PATH)
+    print(f"Best model {best_result.model_name} exported to {INFERENCE_ARTIFACT_PATH}")
 
-print("...Done!")
+    print("...Done!")
@@ -0,0 +1,110 @@
+"""
+Benchmark of the vectorized enrichment of the delay analysis.
+
+The delay analysis is replicated to the requested number of rentals, with
+shifted rental ids so that each copy keeps its own previous rentals, then
+enriched by the former row-wise prepare_data and by the vectorized one. Both
+outputs must be identical. Run from the dashboard directory:
+
+    python -m benchmarks.enrichment_benchmark --rows 10000000
+"""
+
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from src.functions.data_layer import file_checksum, load_delay_analysis
+from src.functions.enrichment import prepare_data
+
+DEFAULT_DATASET_PATH = "src/data/get_around_delay_analysis.xlsx"
+MEDIAN_MINUTE_PRICE = 1.98
+
+
+def group_by_delay(minutes):
+    if minutes < 0:
+        val = "0. Pas de retard"
+    elif minutes < 15:
+        val = "1. Retard < 15 min"
+    elif minutes < 60:
+        val = "2. 15 ≤ Retard < 60 min"
+    elif minutes >= 60:
+        val = "3. Retard ≥ 60 min"
+    return val
+
+
+def prepare_data_rowwise(data, minute_price):
+    """
+    The former prepare_data of the dashboard, the reference of the benchmark.
+    """
+    delay_map = data.set_index("rental_id")["delay_at_checkout_in_minutes"].to_dict()
+    data["previous_ended_rental_delay_at_checkout"] = data[
+        "previous_ended_rental_id"
+    ].apply(lambda x: delay_map.get(x, None))
+    data["profit"] = data["delay_at_checkout_in_minutes"].apply(
+        lambda x: "%.2f" % (x * float(minute_price))
+    )
+    data["profit"] = data["profit"].astype(float)
+    data["delay"] = (
+        data["delay_at_checkout_in_minutes"].dropna().apply(lambda x: group_by_delay(x))
+    )
+    data["rental_count"] = data.groupby("car_id")["car_id"].transform("count")
+    data["critical_delay_for_next_rental_in_minutes"] = (
+        data["time_delta_with_previous_rental_in_minutes"]
+        - data["previous_ended_rental_delay_at_checkout"]
+    )
+    data["is_potential_loss_due_to_delay"] = data["delay_at_checkout_in_minutes"].apply(
+        lambda x: True if x > 0 else False,
+    )
+    filtered_dataset = data[(data["previous_ended_rental_delay_at_checkout"].notna())]
+    data["is_cancel_due_to_delay_by_previous_rental"] = filtered_dataset[
+        "critical_delay_for_next_rental_in_minutes"
+    ].apply(lambda x: True if x < 0 else False)
+    return data
+
+
+def replicate(data: pd.DataFrame, rows: int) -> pd.DataFrame:
+    """
+    Repeat the rentals up to `rows` rows, each copy with its own ids.
+    """
+    repeats = -(-rows // len(data))
+    offset = int(data["rental_id"].max()) + 1
+    copies = []
+    for i in range(repeats):
+        copy = data.copy()
+        copy["rental_id"] += i * offset
+        copy["previous_ended_rental_id"] += i * offset
+        copy["car_id"] += i * offset
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True).iloc[:rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    data = load_delay_analysis(args.dataset, file_checksum(args.dataset))
+    data = replicate(data, args.rows)
+
+    report = {"rows": len(data)}
+    outputs = {}
+    for name, function in (
+        ("rowwise", prepare_data_rowwise),
+        ("vectorized", prepare_data),
+    ):
+        frame = data.copy()
+        start = time.perf_counter()
+        outputs[name] = function(frame, MEDIAN_MINUTE_PRICE)
+        report[f"{name}_seconds"] = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(outputs["rowwise"], outputs["vectorized"])
+    report["identical"] = True
+    report["speedup"] = report["rowwise_seconds"] / report["vectorized_seconds"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
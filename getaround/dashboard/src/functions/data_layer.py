@@ -0,0 +1,81 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+# Types of the columns of the delay analysis. The labels stay strings, the tabs
+# compare and map them as strings.
+DELAY_ANALYSIS_DTYPES = {
+    "rental_id": "int64",
+    "car_id": "int64",
+    "checkin_type": "str",
+    "state": "str",
+    "delay_at_checkout_in_minutes": "float64",
+    "previous_ended_rental_id": "float64",
+    "time_delta_with_previous_rental_in_minutes": "float64",
+}
+
+
+def file_checksum(path: str) -> str:
+    """
+    Return the SHA-256 of a file, the key of its snapshot and of the caches.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_delay_analysis(path: str, checksum: str) -> pd.DataFrame:
+    """
+    Load the delay analysis from its typed Parquet snapshot.
+
+    The Excel file is only read when no snapshot exists for its checksum; the
+    snapshot is then written in a `.cache` folder next to it, and the snapshots
+    of its previous versions are removed.
+
+    Args:
+        path (str): The Excel file.
+        checksum (str): Its checksum, from file_checksum.
+
+    Returns:
+        pd.DataFrame: The delay analysis, with lowercase column names.
+    """
+    directory = os.path.join(os.path.dirname(path), ".cache")
+    name = os.path.splitext(os.path.basename(path))[0]
+    snapshot = os.path.join(directory, f"{name}.{checksum[:16]}.parquet")
+    if os.path.exists(snapshot):
+        return pd.read_parquet(snapshot)
+
+    data = pd.read_excel(path)
+    # Change columns names to lowercase
+    data.rename(lambda x: str(x).lower(), axis="columns", inplace=True)
+    data = data.astype(
+        {
+            column: dtype
+            for column, dtype in DELAY_ANALYSIS_DTYPES.items()
+            if column in data.columns
+        }
+    )
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Written aside then renamed, another session never reads a partial file
+        tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, snapshot)
+        for old_snapshot in glob.glob(os.path.join(directory, f"{name}.*.parquet")):
+            if old_snapshot != snapshot:
+                os.remove(old_snapshot)
+    except OSError:
+        # Read-only data folder, the Excel file is read again at the next start
+        pass
+    return data
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from functions.threshold_curves import AvoidanceCurves, LossCurve
+
+
+@dataclass(frozen=True)
+class DelayKpis:
+    """
+    Values of the research tab for a selected delay.
+
+    Attributes:
+        minute_price (float): Median price of a minute of delay.
+        potential_loss (float): Loss of a delay of the selected length.
+        total_loss (float): Total loss of the delays beyond the selected delay.
+        avoided_delays (int): Delays avoided by the selected minimum time between
+            two rentals.
+    """
+
+    minute_price: float
+    potential_loss: float
+    total_loss: float
+    avoided_delays: int
+
+
+class DelayKpiService:
+    """
+    KPIs of the research tab, precomputed once per version of the dataset.
+
+    The delays are sorted once (LossCurve) and the rentals once by time since
+    their previous rental (AvoidanceCurves). The KPI cards and the markers of the
+    selected delay on the curves are then binary searches, O(log N) per slider
+    value, and the curves that do not depend on the slider are computed once.
+
+    Only the avoidable loss curve and the estimated_loss column depend on the
+    selected delay through the loss of each rental; they are recomputed in one
+    vectorized pass over the presorted arrays, without sorting again.
+    """
+
+    def __init__(self, data: pd.DataFrame, minute_price: float):
+        """
+        Args:
+            data (pd.DataFrame): The prepared delay analysis.
+            minute_price (float): Median price of a minute of delay.
+        """
+        self.minute_price = float(minute_price)
+        self.delays = data["delay_at_checkout_in_minutes"].to_numpy(dtype=float)
+        self.loss_curve = LossCurve(self.delays, self.minute_price)
+        self.avoidance = AvoidanceCurves(
+            data["time_delta_with_previous_rental_in_minutes"],
+            self.delays,
+            data["is_potential_loss_due_to_delay"],
+        )
+
+    def kpis(self, delay: float) -> DelayKpis:
+        """
+        Return the KPI cards for a selected delay, in O(log N).
+        """
+        return DelayKpis(
+            minute_price=self.minute_price,
+            potential_loss=delay * self.minute_price,
+            total_loss=self.loss_curve.total_loss(delay),
+            avoided_delays=self.avoidance.avoided_delays(delay),
+        )
+
+    def total_loss_curve(self, thresholds) -> np.ndarray:
+        """
+        Return the total loss at each threshold, independent of the slider.
+        """
+        return self.loss_curve.total_loss(thresholds)
+
+    def avoided_delays_curve(self, thresholds) -> np.ndarray:
+        """
+        Return the avoided delays at each threshold, independent of the slider.
+        """
+        return self.avoidance.avoided_delays(thresholds)
+
+    def estimated_losses(self, delay: float) -> np.ndarray:
+        """
+        Return the loss of each rental beyond the selected delay, 0 if unknown.
+        """
+        overrun = self.delays - delay
+        return np.where(overrun > 0, overrun * self.minute_price, 0.0)
+
+    def avoidable_loss_curve(self, delay: float, thresholds) -> np.ndarray:
+        """
+        Return the avoidable loss at each threshold, for the losses beyond the
+        selected delay.
+        """
+        curves = self.avoidance.with_losses(self.estimated_losses(delay))
+        return curves.avoidable_loss(thresholds)
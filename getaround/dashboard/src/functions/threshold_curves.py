@@ -0,0 +1,144 @@
+import copy
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class LossCurve:
+    """
+    Total loss of the checkout delays beyond a threshold, for any threshold.
+
+    The loss of a rental for a threshold t is (delay - t) * minute_price when the
+    delay exceeds t, else 0. The delays are sorted once with their suffix sums, so
+    the total loss at a threshold is the sum of the delays above it minus t times
+    their count: a binary search, O(log N) per threshold instead of a pass over
+    the rentals.
+    """
+
+    def __init__(self, delays: pd.Series, minute_price: float):
+        """
+        Args:
+            delays (pd.Series): Checkout delays in minutes, the unknown ones (NaN)
+                cost nothing.
+            minute_price (float): Price of a minute of delay.
+        """
+        values = np.asarray(delays, dtype=float)
+        self.sorted_delays = np.sort(values[~np.isnan(values)])
+        self.minute_price = float(minute_price)
+        # suffix_sums[i] is the sum of sorted_delays[i:], 0 after the last one
+        self.suffix_sums = np.append(np.cumsum(self.sorted_delays[::-1])[::-1], 0.0)
+
+    def total_loss(self, thresholds):
+        """
+        Return the total loss at each threshold.
+
+        Args:
+            thresholds (float | array-like): Threshold(s) in minutes.
+
+        Returns:
+            float | np.ndarray: The total loss, with the shape of `thresholds`.
+        """
+        thresholds = np.asarray(thresholds, dtype=float)
+        # Index of the first delay strictly above each threshold
+        above = np.searchsorted(self.sorted_delays, thresholds, side="right")
+        count = len(self.sorted_delays) - above
+        losses = (self.suffix_sums[above] - thresholds * count) * self.minute_price
+        return losses if losses.ndim else float(losses)
+
+
+class AvoidanceCurves:
+    """
+    Losses and delays avoided by a minimum time between two rentals, for any threshold.
+
+    A rental is avoided by a threshold when the time since its previous rental is
+    strictly below it. Among those, a delay counts when the rental is late
+    (potential loss), and an avoided delay when it is also later than the time
+    since the previous rental. The rentals are sorted once by time since the
+    previous rental, with the cumulative sums of their losses and of the avoided
+    delay indicator, so each threshold is a binary search.
+    """
+
+    def __init__(
+        self,
+        time_deltas: pd.Series,
+        delays: pd.Series,
+        potential_losses: pd.Series,
+        estimated_losses: Optional[pd.Series] = None,
+    ):
+        """
+        Args:
+            time_deltas (pd.Series): Minutes since the previous rental, NaN if none.
+            delays (pd.Series): Checkout delays in minutes.
+            potential_losses (pd.Series): Whether each rental was late.
+            estimated_losses (pd.Series, optional): Estimated loss of each rental,
+                none by default, see with_losses.
+        """
+        time_deltas = np.asarray(time_deltas, dtype=float)
+        delays = np.asarray(delays, dtype=float)
+        potential_losses = np.asarray(potential_losses, dtype=bool)
+
+        # Without a previous rental, no threshold avoids the rental
+        known = np.flatnonzero(~np.isnan(time_deltas))
+        self._sorter = known[np.argsort(time_deltas[known], kind="stable")]
+        self._sorted_potential_losses = potential_losses[self._sorter]
+        self.sorted_time_deltas = time_deltas[self._sorter]
+
+        avoided = potential_losses & (delays > time_deltas)
+        self.avoided_cumsum = np.append(0, np.cumsum(avoided[self._sorter]))
+
+        self.loss_cumsum = np.zeros(len(self._sorter) + 1)
+        if estimated_losses is not None:
+            self.loss_cumsum = self._loss_cumsum(estimated_losses)
+
+    def with_losses(self, estimated_losses) -> "AvoidanceCurves":
+        """
+        Return the same curves with other estimated losses, without sorting again.
+
+        Args:
+            estimated_losses (array-like): Estimated loss of each rental, in the
+                order of the rentals given to the constructor.
+
+        Returns:
+            AvoidanceCurves: A copy with the avoidable losses of these losses.
+        """
+        curves = copy.copy(self)
+        curves.loss_cumsum = self._loss_cumsum(estimated_losses)
+        return curves
+
+    def avoidable_loss(self, thresholds):
+        """
+        Return the loss of the late rentals avoided at each threshold.
+
+        Args:
+            thresholds (float | array-like): Threshold(s) in minutes.
+
+        Returns:
+            float | np.ndarray: The avoidable loss, with the shape of `thresholds`.
+        """
+        losses = self.loss_cumsum[self._avoided_count(thresholds)]
+        return losses if losses.ndim else float(losses)
+
+    def avoided_delays(self, thresholds):
+        """
+        Return the number of delays avoided at each threshold.
+
+        Args:
+            thresholds (float | array-like): Threshold(s) in minutes.
+
+        Returns:
+            int | np.ndarray: The avoided delays, with the shape of `thresholds`.
+        """
+        counts = self.avoided_cumsum[self._avoided_count(thresholds)]
+        return counts if counts.ndim else int(counts)
+
+    def _loss_cumsum(self, estimated_losses) -> np.ndarray:
+        losses = np.asarray(estimated_losses, dtype=float)[self._sorter]
+        losses = np.where(self._sorted_potential_losses, losses, 0.0)
+        return np.append(0.0, np.cumsum(losses))
+
+    def _avoided_count(self, thresholds):
+        # Number of rentals strictly below each threshold
+        return np.searchsorted(
+            self.sorted_time_deltas, np.asarray(thresholds, dtype=float), side="left"
+        )
@@ -4,7 +4,9 @@ import plotly.express as px
 import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import streamlit as st
-from functions import statistics
+from functions import data_layer, enrichment, statistics
+from functions.kpi_service import DelayKpiService
+from functions.threshold_curves import LossCurve
 from plotly.subplots import make_subplots
 
 
@@ -22,63 +24,53 @@ def get_threshold_slider():
         )
 
 
-# @st.cache_data
-def load_delay_analysis_data():
-    data = pd.read_excel("./src/data/get_around_delay_analysis.xlsx")
-    # Change columns names to lowercase
-    data.rename(lambda x: str(x).lower(), axis="columns", inplace=True)
-    return data
-
-
-def group_by_delay(minutes):
-    if minutes < 0:
-        val = "0. Pas de retard"
-    elif minutes < 15:
-        val = "1. Retard < 15 min"
-    elif minutes < 60:
-        val = "2. 15 ≤ Retard < 60 min"
-    elif minutes >= 60:
-        val = "3. Retard ≥ 60 min"
-    return val
-
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_delay_analysis_data(checksum):
+    """
+    Load and prepare the delay analysis once per version of the Excel file.
 
-def prepare_data(data):
-    delay_map = data.set_index("rental_id")["delay_at_checkout_in_minutes"].to_dict()
-    data["previous_ended_rental_delay_at_checkout"] = data[
-        "previous_ended_rental_id"
-    ].apply(lambda x: delay_map.get(x, None))
+    The checksum is the cache key: the typed Parquet snapshot and the prepared
+    frame are only computed again when the file changes. Each rerun gets its own
+    copy of the cached frame, so the tabs may add columns to it.
+    """
+    data = data_layer.load_delay_analysis(DELAY_ANALYSIS_PATH, checksum)
+    return enrichment.prepare_data(data, MEDIAN_MINUTE_PRICE)
 
-    data[data["state"] == "canceled"].head(20)
 
-    data["profit"] = data["delay_at_checkout_in_minutes"].apply(
-        lambda x: "%.2f" % (x * float(MEDIAN_MINUTE_PRICE))
-    )
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_kpi_service(checksum):
+    """
+    KPI service of a version of the delay analysis, read only and shared by the
+    sessions.
+    """
+    return DelayKpiService(load_delay_analysis_data(checksum), MEDIAN_MINUTE_PRICE)
 
-    data["profit"] = data["profit"].astype(float)
 
-    data["delay"] = (
-        data["delay_at_checkout_in_minutes"].dropna().apply(lambda x: group_by_delay(x))
+@st.cache_data(show_spinner=False, max_entries=2)
+def get_research_charts(checksum):
+    """
+    Charts of the research tab that do not depend on the slider, built once per
+    version of the delay analysis. Each rerun gets its own copy, to which the
+    marker of the selected delay is added.
+    """
+    kpi_service = get_kpi_service(checksum)
+    return (
+        total_loss_vs_threshold_viz(kpi_service),
+        plot_avoided_delays_vs_threshold_viz(kpi_service),
     )
 
-    data["rental_count"] = data.groupby("car_id")["car_id"].transform("count")
 
-    data["critical_delay_for_next_rental_in_minutes"] = (
-        data["time_delta_with_previous_rental_in_minutes"]
-        - data["previous_ended_rental_delay_at_checkout"]
+def add_selected_delay_marker(fig, delay, value):
+    """
+    Mark the selected delay and the value of the curve at this delay.
+    """
+    fig.add_vline(
+        x=delay, line_dash="dash", line_color="red", annotation_text="Délai sélectionné"
     )
-
-    # Create a column to mark delays causing potential financial losses
-    filtered_dataset = data[(data["delay_at_checkout_in_minutes"].notna())]
-    data["is_potential_loss_due_to_delay"] = data["delay_at_checkout_in_minutes"].apply(
-        lambda x: True if x > 0 else False,
+    fig.add_scatter(
+        x=[delay], y=[value], mode="markers", marker_color="red", showlegend=False
     )
-
-    filtered_dataset = data[(data["previous_ended_rental_delay_at_checkout"].notna())]
-    data["is_cancel_due_to_delay_by_previous_rental"] = filtered_dataset[
-        "critical_delay_for_next_rental_in_minutes"
-    ].apply(lambda x: True if x < 0 else False)
-
-    return data
+    return fig
 
 
 def delay_distribution_viz(data):
@@ -110,13 +102,8 @@ def delay_distribution_viz(data):
 
 
 def impact_delay_threshold_on_total_loss_viz(data, delay_range=range(0, 800, 50)):
-    loss_values = []
-    for delay in delay_range:
-        adjusted_losses = data["delay_at_checkout_in_minutes"].apply(
-            lambda x: (x - delay) * MEDIAN_MINUTE_PRICE if (x - delay) > 0 else 0
-        )
-        total_loss = adjusted_losses.sum()
-        loss_values.append(total_loss)
+    loss_curve = LossCurve(data["delay_at_checkout_in_minutes"], MEDIAN_MINUTE_PRICE)
+    loss_values = loss_curve.total_loss(list(delay_range))
 
     loss_data = pd.DataFrame(
         {
@@ -233,25 +220,32 @@ def checkout_by_recovery_times_viz(dataset):
     return fig
 
 
+def total_loss_vs_threshold_viz(kpi_service, range=range(0, 1000, 5)):
+    delay_values = list(range)
+    fig = px.line(
+        x=delay_values,
+        y=kpi_service.total_loss_curve(delay_values),
+        labels={
+            "x": "Délai minimum entre deux locations (minutes)",
+            "y": "Pertes estimées ($)",
+        },
+        title="Impact du seuil de délai sur la perte totale",
+    )
+    return fig
+
+
 def financial_impact_delays_for_threshold_and_rentals_viz(
-    dataset, range=range(0, 1000, 5)
+    kpi_service, delay, range=range(0, 1000, 5)
 ):
-    # Calculate avoidable losses for different thresholds
-    results = []
-    for threshold in range:
-        dataset["avoidable_with_threshold"] = (
-            dataset["time_delta_with_previous_rental_in_minutes"] < threshold
-        ) & (dataset["is_potential_loss_due_to_delay"])
-        avoidable_loss = dataset.loc[
-            dataset["avoidable_with_threshold"], "estimated_loss"
-        ].sum()
-        results.append(
-            {
-                "threshold": threshold,
-                "avoidable_loss": avoidable_loss,
-            }
-        )
-    result_df = pd.DataFrame(results)
+    # Calculate avoidable losses for different thresholds, the losses depend on
+    # the selected delay but the rentals are already sorted
+    thresholds = list(range)
+    result_df = pd.DataFrame(
+        {
+            "threshold": thresholds,
+            "avoidable_loss": kpi_service.avoidable_loss_curve(delay, thresholds),
+        }
+    )
     fig = px.line(
         result_df,
         x="threshold",
@@ -268,27 +262,12 @@ def financial_impact_delays_for_threshold_and_rentals_viz(
     return fig
 
 
-def plot_avoided_delays_vs_threshold_viz(data, range=range(0, 1000, 5)):
-    avoided_delays_counts = []
-    for threshold in range:
-        threshold_data = data[
-            data["time_delta_with_previous_rental_in_minutes"] < threshold
-        ]
-
-        avoided_delays = threshold_data[
-            (threshold_data["is_potential_loss_due_to_delay"])
-            & (
-                threshold_data["delay_at_checkout_in_minutes"]
-                > threshold_data["time_delta_with_previous_rental_in_minutes"]
-            )
-        ].shape[0]
-
-        avoided_delays_counts.append(avoided_delays)
-
+def plot_avoided_delays_vs_threshold_viz(kpi_service, range=range(0, 1000, 5)):
+    thresholds = list(range)
     results_df = pd.DataFrame(
         {
-            "threshold": list(range),
-            "avoided_delays": avoided_delays_counts,
+            "threshold": thresholds,
+            "avoided_delays": kpi_service.avoided_delays_curve(thresholds),
         }
     )
     fig = px.line(
@@ -302,10 +281,6 @@ def plot_avoided_delays_vs_threshold_viz(data, range=range(0, 1000, 5)):
         },
     )
 
-    fig.add_vline(
-        x=delay, line_dash="dash", line_color="red", annotation_text="Délai sélectionné"
-    )
-
     return fig
 
 
@@ -429,6 +404,7 @@ def get_correlation_matrix(corr_dataset):
 # Price per minutes for location (calculate in notebook)
 MEDIAN_DAY_PRICE = 119
 MEDIAN_MINUTE_PRICE = 1.98
+DELAY_ANALYSIS_PATH = "./src/data/get_around_delay_analysis.xlsx"
 THRESHOLD_MINUTE_MAX = 400
 MENU_EDA = "Exploration des données"
 MENU_RESEARCH = "Recherches"
@@ -443,8 +419,9 @@ if __name__ == "__main__":
 
     # Create a text element and let the reader know the data is loading.
     with st.spinner("Loading and 🧪 prepare data, delete outliers..."):
-        rawdata = load_delay_analysis_data()
-        dataprepared = prepare_data(data=rawdata)
+        # The enrichment is done in place, both names share the frame
+        checksum = data_layer.file_checksum(DELAY_ANALYSIS_PATH)
+        rawdata = dataprepared = load_delay_analysis_data(checksum)
         # data = delete_ouliers(
         #     dataset=dataprepared, sigmas=2, columns=["delay_at_checkout_in_minutes"]
         # )
@@ -543,27 +520,21 @@ if __name__ == "__main__":
         # Display in 4 columns
         col1, col2, col3, col4 = st.columns(4)
 
+        # Tableaux triés une fois par version des données, chaque KPI est une
+        # recherche binaire
+        kpi_service = get_kpi_service(checksum)
+        kpis = kpi_service.kpis(delay)
+
         # Calculer les pertes potentielles basées sur le coût par minute de retard
-        potential_loss = delay * MEDIAN_MINUTE_PRICE
+        potential_loss = kpis.potential_loss
 
         # Visualisation de l'impact des retards actuels dans les données
-        data["estimated_loss"] = data["delay_at_checkout_in_minutes"].apply(
-            lambda x: (x - delay) * MEDIAN_MINUTE_PRICE if (x - delay) > 0 else 0
-        )
+        data["estimated_loss"] = kpi_service.estimated_losses(delay)
 
-        total_loss_due_to_delays = data["estimated_loss"].sum()
+        total_loss_due_to_delays = kpis.total_loss
 
         # Somme des retards évités
-        threshold_data = data[
-            data["time_delta_with_previous_rental_in_minutes"] < delay
-        ]
-        avoided_delays = threshold_data[
-            (threshold_data["is_potential_loss_due_to_delay"])
-            & (
-                threshold_data["delay_at_checkout_in_minutes"]
-                > threshold_data["time_delta_with_previous_rental_in_minutes"]
-            )
-        ].shape[0]
+        avoided_delays = kpis.avoided_delays
 
         with col1:
             st.markdown(
@@ -609,39 +580,25 @@ if __name__ == "__main__":
         st.markdown("---")
 
         with st.spinner("Loading..."):
-            delay_values = list(range(0, 1000, 5))
-            losses = [
-                data["delay_at_checkout_in_minutes"]
-                .apply(lambda x: (x - d) * MEDIAN_MINUTE_PRICE if (x - d) > 0 else 0)
-                .sum()
-                for d in delay_values
-            ]
+            # Courbes construites une fois par version des données, seul le
+            # marqueur du délai sélectionné suit le curseur
+            total_loss_fig, avoided_delays_fig = get_research_charts(checksum)
 
-            fig = px.line(
-                x=delay_values,
-                y=losses,
-                labels={
-                    "x": "Délai minimum entre deux locations (minutes)",
-                    "y": "Pertes estimées ($)",
-                },
-                title="Impact du seuil de délai sur la perte totale",
-            )
-            fig.add_vline(
-                x=delay,
-                line_dash="dash",
-                line_color="red",
-                annotation_text="Délai sélectionné",
-            )
+            fig = add_selected_delay_marker(total_loss_fig, delay, kpis.total_loss)
             st.plotly_chart(fig)
 
             st.markdown("---")
 
-            fig = financial_impact_delays_for_threshold_and_rentals_viz(data)
+            fig = financial_impact_delays_for_threshold_and_rentals_viz(
+                kpi_service, delay
+            )
             st.plotly_chart(fig)
 
             st.markdown("---")
 
-            fig = plot_avoided_delays_vs_threshold_viz(data=data)
+            fig = add_selected_delay_marker(
+                avoided_delays_fig, delay, kpis.avoided_delays
+            )
             st.plotly_chart(fig)
 
             st.markdown("---")
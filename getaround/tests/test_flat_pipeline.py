@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+
+from api.src.services.flat_pipeline import FlatPipeline
+from training.candidates import (
+    CATEGORICAL_FEATURES,
+    NUMERIC_FEATURES,
+    TARGET,
+    build_preprocessor,
+    prepare_dataset,
+)
+from training.export import export_pipeline
+
+DATASET_PATH = Path(__file__).parents[1] / "data" / "get_around_pricing_project.csv"
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return prepare_dataset(pd.read_csv(DATASET_PATH, nrows=2000))
+
+
+@pytest.fixture
+def unseen_cars(dataset):
+    cars = dataset[FEATURES].head(4).copy()
+    cars["model_key"] = ["Tesla", "Citroën", "Citroën", "Citroën"]
+    cars["fuel"] = ["diesel", "hydrogen", "diesel", "diesel"]
+    cars["paint_color"] = ["black", "black", "pink", "black"]
+    cars["car_type"] = ["convertible", "convertible", "convertible", "camper"]
+    return cars
+
+
+def fit_and_export(dataset, regressor, path, preprocessor=None):
+    pipeline = Pipeline(
+        [
+            ("preprocessor", preprocessor or build_preprocessor()),
+            ("regressor", regressor),
+        ]
+    )
+    pipeline.fit(dataset[FEATURES], dataset[TARGET])
+    export_pipeline(pipeline, str(path))
+    return pipeline, FlatPipeline.load(str(path))
+
+
+@pytest.mark.parametrize(
+    "regressor",
+    [Ridge(alpha=1.5), RandomForestRegressor(n_estimators=5, random_state=42)],
+)
+def test_unseen_categories_priced_the_same_by_both_paths(
+    dataset, unseen_cars, regressor, tmp_path
+):
+    pipeline, flat = fit_and_export(dataset, regressor, tmp_path / "model.npz")
+
+    np.testing.assert_allclose(
+        flat.predict(unseen_cars), pipeline.predict(unseen_cars), rtol=1e-6
+    )
+
+
+def test_unseen_categories_rejected_by_both_paths(dataset, unseen_cars, tmp_path):
+    # Models trained before handle_unknown="ignore" reject the unknown values
+    preprocessor = build_preprocessor()
+    preprocessor.set_params(cat__onehot__handle_unknown="error")
+    pipeline, flat = fit_and_export(
+        dataset, Ridge(), tmp_path / "model.npz", preprocessor
+    )
+    unknown_fuel = unseen_cars.iloc[[1]]
+
+    with pytest.raises(ValueError):
+        pipeline.predict(unknown_fuel)
+    with pytest.raises(ValueError, match="hydrogen"):
+        flat.predict(unknown_fuel)
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from src.services import model_registry
+from src.services.model_registry import ModelRegistry, resolve_model_version
+
+MODEL_URI = "models:/Ridge@production"
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        model_registry, "INFERENCE_ARTIFACT_PATH", str(tmp_path / "missing.npz")
+    )
+    monkeypatch.setenv("MLFLOW_LOGGED_MODEL", MODEL_URI)
+    # Version the alias points to, changed by the tests as a promotion would
+    aliases = {MODEL_URI: "1"}
+    registry = ModelRegistry(
+        loader=lambda model_uri: f"model {aliases[model_uri]}",
+        resolver=aliases.get,
+    )
+    registry.aliases = aliases
+    return registry
+
+
+def test_reload_when_the_alias_points_to_a_new_version(registry):
+    async def scenario():
+        await registry.load()
+        unchanged = await registry.reload_if_changed()
+        registry.aliases[MODEL_URI] = "2"
+        reloaded = await registry.reload_if_changed()
+        return unchanged, reloaded
+
+    unchanged, reloaded = asyncio.run(scenario())
+
+    assert unchanged is None
+    assert reloaded.model == "model 2"
+    assert registry.current.model == "model 2"
+
+
+def test_no_reload_without_a_version_at_startup(registry):
+    registry.aliases[MODEL_URI] = None
+
+    async def scenario():
+        await registry.load()
+        registry.aliases[MODEL_URI] = "2"
+        # The first version seen becomes the reference
+        first = await registry.reload_if_changed()
+        registry.aliases[MODEL_URI] = "3"
+        return first, await registry.reload_if_changed()
+
+    registry._loader = lambda model_uri: "model"
+    first, second = asyncio.run(scenario())
+
+    assert first is None
+    assert second is not None
+
+
+@pytest.mark.parametrize(
+    "model_uri",
+    ["models:/Ridge/3", "runs:/0123/model", "/app/src/artifacts/model.npz"],
+)
+def test_pinned_uris_are_not_resolved(model_uri):
+    assert resolve_model_version(model_uri) is None
@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+
+from src.services.executor import BoundedExecutor
+from src.services.feature_encoder import FEATURES
+from src.services.model_registry import LoadedModel, PredictionInputError
+from src.services.prediction_batcher import PredictionBatcher
+
+
+class FuelModel:
+    """
+    Price of a car from its mileage, rejects the unknown fuels as a whole batch.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, df):
+        self.batch_sizes.append(len(df))
+        unknown = sorted(set(df["fuel"]) - {"diesel", "petrol"})
+        if unknown:
+            raise ValueError(f"Found unknown categories {unknown} in column fuel")
+        return df["mileage"].to_numpy(dtype=np.float64) / 1000
+
+
+class Registry:
+    def __init__(self, model):
+        self.loaded_model = LoadedModel(
+            name="default", uri="test", model=model, version=1, loaded_at=0.0
+        )
+
+    def get(self, name):
+        return self.loaded_model
+
+
+def car(mileage, fuel="diesel"):
+    values = dict.fromkeys(FEATURES, "x")
+    values.update(
+        {"mileage": mileage, "engine_power": 100, "fuel": fuel, "model_key": "bmw"}
+    )
+    return tuple(values[feature] for feature in FEATURES)
+
+
+async def predict_all(batcher, rows):
+    batcher.start()
+    try:
+        return await asyncio.gather(
+            *(batcher.predict(row) for row in rows), return_exceptions=True
+        )
+    finally:
+        await batcher.stop()
+
+
+def test_only_the_rejected_cars_fail_in_a_batch():
+    model = FuelModel()
+    batcher = PredictionBatcher(
+        Registry(model), BoundedExecutor(max_workers=2), max_wait_ms=50
+    )
+    rows = [car(1000 * i) for i in range(10)]
+    rows.insert(3, car(3500, fuel="hydrogen"))
+
+    results = asyncio.run(predict_all(batcher, rows))
+
+    assert isinstance(results[3], PredictionInputError)
+    assert "hydrogen" in str(results[3])
+    assert results[:3] + results[4:] == [float(i) for i in range(10)]
+    # The whole batch first, then only its halves holding the rejected car
+    assert model.batch_sizes[0] == 11
+    assert len(model.batch_sizes) < 11
+
+
+def test_other_errors_fail_the_whole_batch():
+    class BrokenModel:
+        def predict(self, df):
+            raise RuntimeError("model broken")
+
+    batcher = PredictionBatcher(
+        Registry(BrokenModel()), BoundedExecutor(max_workers=2), max_wait_ms=50
+    )
+
+    results = asyncio.run(predict_all(batcher, [car(1000), car(2000)]))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from api.src.services import pricing_data
+from api.src.services.pricing_data import read_csv_cached
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "pricing.csv"
+    pd.DataFrame(
+        {"model_key": ["Citroën", "Renault", "Citroën"], "mileage": [10, 20, 30]}
+    ).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def parsed_csvs(monkeypatch):
+    # Count the CSV parses, the other loads come from the cache
+    calls = []
+    parse_csv = pricing_data._parse_csv
+
+    def counting_parse_csv(path, dtypes):
+        calls.append(dtypes)
+        return parse_csv(path, dtypes)
+
+    monkeypatch.setattr(pricing_data, "_parse_csv", counting_parse_csv)
+    return calls
+
+
+def test_cache_is_read_for_the_same_dtypes(csv_path, parsed_csvs):
+    dtypes = {"model_key": "category", "mileage": "int32"}
+
+    read_csv_cached(csv_path, dtypes)
+    frame = read_csv_cached(csv_path, dtypes)
+
+    assert len(parsed_csvs) == 1
+    assert frame["mileage"].dtype == "int32"
+    assert isinstance(frame["model_key"].dtype, pd.CategoricalDtype)
+
+
+def test_cache_is_rebuilt_when_the_dtypes_change(csv_path, parsed_csvs):
+    read_csv_cached(csv_path, {"model_key": "category", "mileage": "int32"})
+    frame = read_csv_cached(csv_path, {"model_key": "category", "mileage": "int64"})
+
+    assert len(parsed_csvs) == 2
+    assert frame["mileage"].dtype == "int64"
+
+    # The new dtypes are now the cached ones
+    read_csv_cached(csv_path, {"model_key": "category", "mileage": "int64"})
+    assert len(parsed_csvs) == 2
@@ -0,0 +1,40 @@
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.candidates import (
+    CATEGORICAL_FEATURES,
+    NUMERIC_FEATURES,
+    build_preprocessor,
+    prepare_dataset,
+)
+from training.streaming import fit_preprocessor, train_streaming
+
+DATASET_PATH = Path(__file__).parents[1] / "data" / "get_around_pricing_project.csv"
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+
+def test_preprocessor_fitted_by_chunks_matches_the_in_memory_one():
+    dataset = prepare_dataset(pd.read_csv(DATASET_PATH))
+    expected = build_preprocessor().fit(dataset[FEATURES])
+
+    preprocessor = fit_preprocessor(str(DATASET_PATH), chunksize=1000)
+
+    np.testing.assert_allclose(
+        preprocessor.transform(dataset[FEATURES]).toarray(),
+        expected.transform(dataset[FEATURES]),
+    )
+
+
+def test_training_without_validation_rows():
+    result = train_streaming(
+        str(DATASET_PATH), chunksize=2000, epochs=1, validation_fraction=0
+    )
+
+    assert math.isnan(result.rmse)
+    assert math.isnan(result.r2_score)
+    assert result.pipeline.predict(
+        prepare_dataset(pd.read_csv(DATASET_PATH, nrows=5))[FEATURES]
+    ).shape == (5,)
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from training.transformers import RareCategoryGrouper
+
+
+def cars(counts):
+    return pd.DataFrame(
+        {"car_type": [car_type for car_type, n in counts.items() for _ in range(n)]}
+    )
+
+
+def test_category_at_the_threshold_is_grouped():
+    # 5.00% and 5.004% of the rows, both rounded to 5.0, which is not above 5.0
+    X = cars({"sedan": 18749, "coupe": 1250, "van": 1251, "suv": 3750})
+
+    grouper = RareCategoryGrouper(min_frequency={"car_type": 0.05}).fit(X)
+
+    assert sorted(grouper.categories_["car_type"]) == ["sedan", "suv"]
+    assert grouper.transform(X)["car_type"].value_counts()["other"] == 2501
+
+
+def test_category_above_the_threshold_is_kept():
+    # 5.01% of the rows
+    X = cars({"sedan": 94990, "coupe": 5010})
+
+    grouper = RareCategoryGrouper(min_frequency={"car_type": 0.05}).fit(X)
+
+    assert sorted(grouper.categories_["car_type"]) == ["coupe", "sedan"]
+
+
+def test_partial_fit_matches_fit():
+    X = cars({"sedan": 18749, "coupe": 1250, "van": 1251, "suv": 3750})
+    X = X.sample(frac=1, random_state=0)
+
+    grouper = RareCategoryGrouper(min_frequency={"car_type": 0.05})
+    for start in range(0, len(X), 7000):
+        grouper.partial_fit(X.iloc[start : start + 7000])
+
+    assert sorted(grouper.categories_["car_type"]) == ["sedan", "suv"]
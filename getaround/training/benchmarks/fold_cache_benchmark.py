@@ -0,0 +1,77 @@
+"""
+Benchmark of the cross-validation with and without the per-fold transform cache.
+
+Run from the getaround directory:
+
+    python -m training.benchmarks.fold_cache_benchmark --replicate 10
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from training.candidates import (
+    CATEGORICAL_FEATURES,
+    NUMERIC_FEATURES,
+    TARGET,
+    build_models,
+    build_preprocessor,
+    prepare_dataset,
+)
+from training.experiments import run_experiments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default="./data/get_around_pricing_project.csv")
+    parser.add_argument(
+        "--replicate", type=int, default=1, help="Concatenate the dataset N times"
+    )
+    parser.add_argument("--cv", type=int, default=10)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument(
+        "--models",
+        nargs="*",
+        help="Subset of the candidate models, all of them by default",
+    )
+    args = parser.parse_args()
+
+    dataset = prepare_dataset(pd.read_csv(args.dataset))
+    dataset = pd.concat([dataset] * args.replicate, ignore_index=True)
+    X = dataset[NUMERIC_FEATURES + CATEGORICAL_FEATURES]
+    y = dataset[TARGET]
+
+    models = build_models()
+    if args.models:
+        models = {name: models[name] for name in args.models}
+
+    report = {"rows": len(X), "cv": args.cv, "models": list(models)}
+    scores = {}
+    for cache_folds in [False, True]:
+        start = time.perf_counter()
+        results = run_experiments(
+            models,
+            build_preprocessor(),
+            X,
+            y,
+            cv=args.cv,
+            n_jobs=args.n_jobs,
+            cache_folds=cache_folds,
+        )
+        label = "cached" if cache_folds else "uncached"
+        report[f"{label}_seconds"] = time.perf_counter() - start
+        scores[label] = {name: result.cv_scores for name, result in results.items()}
+
+    report["speedup"] = report["uncached_seconds"] / report["cached_seconds"]
+    report["max_cv_score_diff"] = max(
+        float(np.max(np.abs(scores["cached"][name] - scores["uncached"][name])))
+        for name in models
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the LowercaseTransformer against the former per-value lower-casing.
+
+Run from the getaround directory:
+
+    python -m training.benchmarks.lowercase_benchmark --rows 10000000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from training.candidates import CATEGORICAL_FEATURES
+from training.transformers import LowercaseTransformer
+
+
+def legacy_transform(X: pd.DataFrame) -> pd.DataFrame:
+    # Former implementation, str.lower() called on every value
+    return X.apply(lambda x: x.str.lower() if x.dtype == "object" else x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default="./data/get_around_pricing_project.csv")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Object columns, the only ones the former implementation lower-cases
+    dataset = pd.read_csv(args.dataset, usecols=CATEGORICAL_FEATURES).astype(object)
+    # The pricing dataset replicated up to the number of rows
+    X = dataset.iloc[np.resize(np.arange(len(dataset)), args.rows)].reset_index(
+        drop=True
+    )
+
+    transformer = LowercaseTransformer().fit(X)
+    timings = {}
+    outputs = {}
+    for name, transform in [
+        ("legacy", legacy_transform),
+        ("vectorized", transformer.transform),
+    ]:
+        seconds = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            outputs[name] = transform(X)
+            seconds.append(time.perf_counter() - start)
+        timings[f"{name}_seconds"] = min(seconds)
+
+    report = {
+        "rows": len(X),
+        "columns": CATEGORICAL_FEATURES,
+        **timings,
+        "speedup": timings["legacy_seconds"] / timings["vectorized_seconds"],
+        "identical": bool(outputs["legacy"].equals(outputs["vectorized"])),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
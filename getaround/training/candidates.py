@@ -0,0 +1,118 @@
+import pandas as pd
+import xgboost as xgb
+from sklearn.compose import ColumnTransformer
+from sklearn.discriminant_analysis import StandardScaler
+from sklearn.ensemble import (
+    GradientBoostingRegressor,
+    RandomForestRegressor,
+)
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from training.transformers import LowercaseTransformer, RareCategoryGrouper
+
+NUMERIC_FEATURES = [
+    "mileage",
+    "engine_power",
+    "private_parking_available",
+    "has_gps",
+    "has_air_conditioning",
+    "automatic_car",
+    "has_getaround_connect",
+    "has_speed_regulator",
+    "winter_tires",
+]
+CATEGORICAL_FEATURES = ["model_key", "fuel", "paint_color", "car_type"]
+TARGET = "rental_price_per_day"
+
+# Regroupement des données model_key et car_type ayant peu de données
+RARE_CATEGORY_MIN_FREQUENCY = {"car_type": 0.05, "model_key": 0.01}
+
+
+def prepare_dataset(rawdata: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepare the raw pricing data for the training.
+
+    Args:
+        rawdata (pd.DataFrame): The content of get_around_pricing_project.csv.
+
+    Returns:
+        pd.DataFrame: The features and the target.
+    """
+    return rawdata.drop(columns=["Unnamed: 0"])
+
+
+def build_preprocessor() -> ColumnTransformer:
+    """
+    Preprocessing shared by all the candidate models.
+    """
+    # Transform also cat var to lowercase
+    return ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), NUMERIC_FEATURES),
+            (
+                "cat",
+                Pipeline(
+                    steps=[
+                        ("lowercase", LowercaseTransformer()),
+                        (
+                            "rare",
+                            RareCategoryGrouper(
+                                min_frequency=RARE_CATEGORY_MIN_FREQUENCY
+                            ),
+                        ),
+                        # Unknown values of the columns not grouped are encoded as
+                        # all zeros, as the flat pipeline of the API does
+                        ("onehot", OneHotEncoder(handle_unknown="ignore")),
+                    ]
+                ),
+                CATEGORICAL_FEATURES,
+            ),
+        ]
+    )
+
+
+def build_models() -> dict:
+    """
+    Candidate regressors by name, the name is also the registered model name.
+    """
+    return {
+        "Linear Regression": LinearRegression(),
+        "Ridge": Ridge(alpha=1.5),
+        "Lasso": Lasso(alpha=0.6),
+        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
+        "Gradient Boosting": GradientBoostingRegressor(
+            n_estimators=100, random_state=42
+        ),
+        "XGBoost": xgb.XGBRegressor(n_estimators=100, random_state=42),
+    }
+
+
+# Search space of each candidate: a list is a choice, a dict a range of numbers
+# ({"low", "high"}, sampled on a log scale with "log", as integers with "int")
+SEARCH_SPACES = {
+    "Linear Regression": {},
+    "Ridge": {"alpha": {"low": 1e-3, "high": 1e2, "log": True}},
+    "Lasso": {"alpha": {"low": 1e-3, "high": 1e1, "log": True}},
+    "Random Forest": {
+        "n_estimators": {"low": 50, "high": 300, "int": True},
+        "max_depth": [None, 8, 16, 32],
+        "min_samples_leaf": {"low": 1, "high": 10, "int": True},
+        "max_features": [1.0, 0.5, "sqrt"],
+    },
+    "Gradient Boosting": {
+        "n_estimators": {"low": 50, "high": 400, "int": True},
+        "learning_rate": {"low": 0.01, "high": 0.3, "log": True},
+        "max_depth": {"low": 2, "high": 6, "int": True},
+        "subsample": {"low": 0.5, "high": 1.0},
+    },
+    "XGBoost": {
+        "n_estimators": {"low": 50, "high": 500, "int": True},
+        "learning_rate": {"low": 0.01, "high": 0.3, "log": True},
+        "max_depth": {"low": 3, "high": 10, "int": True},
+        "subsample": {"low": 0.5, "high": 1.0},
+        "colsample_bytree": {"low": 0.5, "high": 1.0},
+        "min_child_weight": {"low": 1.0, "high": 10.0, "log": True},
+    },
+}
@@ -0,0 +1,213 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer, r2_score, root_mean_squared_error
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.pipeline import Pipeline
+
+from training.fold_cache import FoldMatrices, build_fold_matrices
+
+
+@dataclass
+class ExperimentResult:
+    """
+    Evaluation of one candidate model.
+
+    Attributes:
+        model_name (str): Name of the model in the experiment.
+        pipeline (Pipeline): The pipeline fitted on the train split.
+        rmse (float): RMSE on the test split.
+        mae (float): MAE on the test split.
+        r2_score (float): R2 score on the test split.
+        cv_scores (np.ndarray): Cross-validation scores, one per fold.
+        fit_seconds (float): Total fitting time of the model over all its tasks.
+        params (dict): Hyperparameters set on the regressor by the search, if any.
+    """
+
+    model_name: str
+    pipeline: Pipeline
+    rmse: float
+    mae: float
+    r2_score: float
+    cv_scores: np.ndarray
+    fit_seconds: float
+    params: Dict = field(default_factory=dict)
+
+
+def run_experiments(
+    models: Dict,
+    preprocessor,
+    X,
+    y,
+    on_result: Optional[Callable[[ExperimentResult], None]] = None,
+    scoring: str = "r2",
+    cv: int = 10,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    n_jobs: int = -1,
+    cache_folds: bool = True,
+) -> Dict[str, ExperimentResult]:
+    """
+    Evaluate the candidate models, scheduling every model x fold fit in parallel.
+
+    For each model, one task fits the pipeline on the train split and evaluates it
+    on the test split, and one task per fold computes the cross-validation score.
+    All the tasks run on the joblib process pool and come back as soon as they are
+    done, so the wall time scales with the number of cores rather than with the
+    number of models.
+
+    With `cache_folds`, the preprocessing is fitted once per split and its design
+    matrices are shared by all the models, whose tasks then only fit the regressor.
+
+    Args:
+        models (dict): Regressors by name.
+        preprocessor: The preprocessing step, cloned for every task.
+        X (pd.DataFrame): Features.
+        y (pd.Series): Target.
+        on_result (callable, optional): Called with the ExperimentResult of a model
+            as soon as all its tasks are done, e.g. to log it to MLflow.
+        scoring (str): Scorer used for the cross-validation.
+        cv (int): Number of cross-validation folds.
+        test_size (float): Proportion of the test split.
+        random_state (int): Seed of the train/test split.
+        n_jobs (int): Number of joblib workers, -1 for all the cores.
+        cache_folds (bool): Transform each split once for all the models instead of
+            fitting the whole pipeline in every task.
+
+    Returns:
+        dict: ExperimentResult by model name.
+    """
+    train_index, test_index = train_test_split(
+        np.arange(len(X)), test_size=test_size, random_state=random_state
+    )
+    folds = list(KFold(n_splits=cv).split(X, y))
+
+    if cache_folds:
+        holdout, *fold_matrices = build_fold_matrices(
+            preprocessor, X, y, [(train_index, test_index)] + folds, n_jobs=n_jobs
+        )
+        tasks = []
+        for model_name, model in models.items():
+            tasks.append(
+                delayed(_fit_cached_holdout)(model_name, clone(model), holdout)
+            )
+            for fold, matrices in enumerate(fold_matrices):
+                tasks.append(
+                    delayed(_fit_cached_fold)(
+                        model_name, clone(model), matrices, fold, scoring
+                    )
+                )
+    else:
+        X_train, X_test = X.iloc[train_index], X.iloc[test_index]
+        y_train, y_test = y.iloc[train_index], y.iloc[test_index]
+        tasks = []
+        for model_name, model in models.items():
+            pipeline = Pipeline([("preprocessor", preprocessor), ("regressor", model)])
+            tasks.append(
+                delayed(_fit_holdout)(
+                    model_name, clone(pipeline), X_train, y_train, X_test, y_test
+                )
+            )
+            for fold, (fold_train_index, fold_test_index) in enumerate(folds):
+                tasks.append(
+                    delayed(_fit_fold)(
+                        model_name,
+                        clone(pipeline),
+                        X,
+                        y,
+                        fold_train_index,
+                        fold_test_index,
+                        fold,
+                        scoring,
+                    )
+                )
+
+    remaining_tasks = {model_name: cv + 1 for model_name in models}
+    holdouts = {}
+    cv_scores = {model_name: np.zeros(cv) for model_name in models}
+    fit_seconds = dict.fromkeys(models, 0.0)
+    results = {}
+
+    parallel = Parallel(n_jobs=n_jobs, return_as="generator_unordered")
+    for model_name, fold, payload, seconds in parallel(tasks):
+        fit_seconds[model_name] += seconds
+        if fold is None:
+            holdouts[model_name] = payload
+        else:
+            cv_scores[model_name][fold] = payload
+
+        remaining_tasks[model_name] -= 1
+        if remaining_tasks[model_name] == 0:
+            results[model_name] = ExperimentResult(
+                model_name=model_name,
+                cv_scores=cv_scores[model_name],
+                fit_seconds=fit_seconds[model_name],
+                **holdouts[model_name],
+            )
+            if on_result is not None:
+                on_result(results[model_name])
+
+    return results
+
+
+def _fit_holdout(model_name, pipeline, X_train, y_train, X_test, y_test):
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    y_pred = pipeline.predict(X_test)
+    payload = _holdout_payload(pipeline, y_test, y_pred)
+    return model_name, None, payload, time.perf_counter() - start
+
+
+def _fit_fold(model_name, pipeline, X, y, train_index, test_index, fold, scoring):
+    start = time.perf_counter()
+    pipeline.fit(X.iloc[train_index], y.iloc[train_index])
+    score = get_scorer(scoring)(pipeline, X.iloc[test_index], y.iloc[test_index])
+    return model_name, fold, score, time.perf_counter() - start
+
+
+def evaluate_on_holdout(regressor, matrices: FoldMatrices) -> Tuple[Dict, float]:
+    """
+    Fit a regressor on the transformed train split and evaluate it on the test split.
+
+    Args:
+        regressor: The unfitted regressor, fitted in place.
+        matrices (FoldMatrices): The design matrices of the train/test split.
+
+    Returns:
+        tuple: The fitted pipeline and its test metrics, as keyword arguments of
+        ExperimentResult, and the fitting time in seconds.
+    """
+    start = time.perf_counter()
+    regressor.fit(matrices.X_train, matrices.y_train)
+    y_pred = regressor.predict(matrices.X_test)
+    # Same fitted pipeline as without the cache, for the logging and the export
+    pipeline = Pipeline(
+        [("preprocessor", matrices.preprocessor), ("regressor", regressor)]
+    )
+    payload = _holdout_payload(pipeline, matrices.y_test, y_pred)
+    return payload, time.perf_counter() - start
+
+
+def _fit_cached_holdout(model_name, regressor, matrices: FoldMatrices):
+    payload, seconds = evaluate_on_holdout(regressor, matrices)
+    return model_name, None, payload, seconds
+
+
+def _fit_cached_fold(model_name, regressor, matrices: FoldMatrices, fold, scoring):
+    start = time.perf_counter()
+    regressor.fit(matrices.X_train, matrices.y_train)
+    score = get_scorer(scoring)(regressor, matrices.X_test, matrices.y_test)
+    return model_name, fold, score, time.perf_counter() - start
+
+
+def _holdout_payload(pipeline, y_test, y_pred) -> dict:
+    return {
+        "pipeline": pipeline,
+        "rmse": root_mean_squared_error(y_test, y_pred),
+        "mae": float(np.mean(np.abs(y_test - y_pred))),
+        "r2_score": r2_score(y_test, y_pred),
+    }
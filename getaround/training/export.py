@@ -0,0 +1,166 @@
+import json
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.linear_model._base import LinearModel
+from sklearn.pipeline import Pipeline
+
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def export_pipeline(pipeline: Pipeline, path: str):
+    """
+    Export a fitted pricing pipeline to a flat NumPy artifact (.npz).
+
+    The artifact only holds arrays: the StandardScaler statistics, the OneHotEncoder
+    categories and handling of unknown values, the columns grouped by the
+    RareCategoryGrouper and the regressor, either its coefficients or its trees
+    flattened into node arrays. The API evaluates it with NumPy alone, without
+    mlflow nor unpickling, which makes loading it a matter of milliseconds.
+
+    Args:
+        pipeline (Pipeline): Fitted ("preprocessor", "regressor") pipeline.
+        path (str): Destination of the artifact.
+    """
+    preprocessor = pipeline.named_steps["preprocessor"]
+    regressor = pipeline.named_steps["regressor"]
+
+    transformers = {
+        name: (step, columns) for name, step, columns in preprocessor.transformers_
+    }
+    scaler, numeric_features = transformers["num"]
+    categorical_step, categorical_features = transformers["cat"]
+    onehot = categorical_step.named_steps["onehot"]
+
+    arrays = {
+        "format_version": np.array(ARTIFACT_FORMAT_VERSION),
+        "numeric_features": np.array(numeric_features, dtype=str),
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "categorical_features": np.array(categorical_features, dtype=str),
+    }
+    for i, categories in enumerate(onehot.categories_):
+        arrays[f"categories_{i}"] = np.array(categories, dtype=str)
+    arrays["handle_unknown"] = np.array(onehot.handle_unknown)
+    # Columns whose rare and unknown values are encoded as their "other" category
+    rare = categorical_step.named_steps.get("rare")
+    if rare == "passthrough":
+        rare = None
+    arrays["grouped_features"] = np.array(
+        list(rare.categories_) if rare is not None else [], dtype=str
+    )
+    arrays["other_category"] = np.array(rare.other if rare is not None else "")
+
+    if isinstance(regressor, (LinearModel, SGDRegressor)):
+        arrays["kind"] = np.array("linear")
+        arrays["coef"] = np.ravel(regressor.coef_).astype(np.float64)
+        arrays["intercept"] = np.array(float(np.ravel(regressor.intercept_)[0]))
+    else:
+        arrays["kind"] = np.array("trees")
+        arrays.update(_flatten_trees(regressor, preprocessor.sparse_output_))
+
+    np.savez_compressed(path, **arrays)
+
+
+def _flatten_trees(regressor, sparse_input: bool) -> dict:
+    """
+    Flatten the trees of an ensemble into node arrays with global node ids.
+
+    Leaves loop on themselves, so every row can walk `max_depth` steps. The
+    prediction is `base + scale * sum(value[leaf] over trees)`.
+    """
+    if isinstance(regressor, RandomForestRegressor):
+        trees = [_sklearn_tree(estimator.tree_) for estimator in regressor.estimators_]
+        base, scale, strict, zero_as_missing = 0.0, 1 / len(trees), False, False
+    elif isinstance(regressor, GradientBoostingRegressor):
+        trees = [
+            _sklearn_tree(estimator.tree_) for estimator in regressor.estimators_[:, 0]
+        ]
+        base = float(np.ravel(regressor.init_.constant_)[0])
+        scale, strict, zero_as_missing = regressor.learning_rate, False, False
+    elif hasattr(regressor, "get_booster"):
+        booster = regressor.get_booster()
+        trees = [
+            _xgboost_tree(json.loads(dump))
+            for dump in booster.get_dump(dump_format="json")
+        ]
+        learner_params = json.loads(booster.save_config())["learner"][
+            "learner_model_param"
+        ]
+        base = float(learner_params["base_score"].strip("[]"))
+        # XGBoost does not store the zeros of a sparse input, they are seen as missing
+        scale, strict, zero_as_missing = 1.0, True, sparse_input
+    else:
+        raise TypeError(f"Cannot export regressor {type(regressor).__name__}")
+
+    roots, offset = [], 0
+    for tree in trees:
+        roots.append(offset)
+        tree["left"] += offset
+        tree["right"] += offset
+        tree["missing"] += offset
+        offset += len(tree["value"])
+
+    flat = {
+        key: np.concatenate([tree[key] for tree in trees])
+        for key in ["feature", "threshold", "left", "right", "missing", "value"]
+    }
+    flat.update(
+        {
+            "roots": np.array(roots, dtype=np.int64),
+            "max_depth": np.array(max(tree["depth"] for tree in trees)),
+            "base": np.array(base),
+            "scale": np.array(scale),
+            "strict": np.array(strict),
+            "zero_as_missing": np.array(zero_as_missing),
+        }
+    )
+    return flat
+
+
+def _sklearn_tree(tree) -> dict:
+    nodes = np.arange(tree.node_count)
+    is_leaf = tree.children_left == -1
+    left = np.where(is_leaf, nodes, tree.children_left)
+    return {
+        "feature": np.where(is_leaf, 0, tree.feature).astype(np.int64),
+        "threshold": np.where(is_leaf, 0.0, tree.threshold),
+        "left": left.astype(np.int64),
+        "right": np.where(is_leaf, nodes, tree.children_right).astype(np.int64),
+        "missing": left.astype(np.int64),
+        "value": tree.value[:, 0, 0].astype(np.float64),
+        "depth": tree.max_depth,
+    }
+
+
+def _xgboost_tree(root: dict) -> dict:
+    nodes = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes[node["nodeid"]] = node
+        stack.extend(node.get("children", []))
+
+    size = max(nodes) + 1
+    tree = {
+        "feature": np.zeros(size, dtype=np.int64),
+        "threshold": np.zeros(size),
+        "left": np.arange(size, dtype=np.int64),
+        "right": np.arange(size, dtype=np.int64),
+        "missing": np.arange(size, dtype=np.int64),
+        "value": np.zeros(size),
+        "depth": 0,
+    }
+    for node_id, node in nodes.items():
+        if "leaf" in node:
+            tree["value"][node_id] = node["leaf"]
+            continue
+        tree["feature"][node_id] = int(node["split"].lstrip("f"))
+        # The dump rounds the float32 thresholds, round them back
+        tree["threshold"][node_id] = np.float32(node.get("split_condition", 0.0))
+        tree["left"][node_id] = node["yes"]
+        tree["right"][node_id] = node["no"]
+        tree["missing"][node_id] = node["missing"]
+        tree["depth"] = max(tree["depth"], node["depth"] + 1)
+    return tree
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+
+
+@dataclass
+class FoldMatrices:
+    """
+    Design matrices of one train/test split, shared by all the candidate models.
+
+    Attributes:
+        preprocessor: The preprocessing fitted on the train rows of the split.
+        X_train: Transformed train rows.
+        y_train (np.ndarray): Target of the train rows.
+        X_test: Transformed test rows, with the preprocessing of the train rows.
+        y_test (np.ndarray): Target of the test rows.
+    """
+
+    preprocessor: object
+    X_train: object
+    y_train: np.ndarray
+    X_test: object
+    y_test: np.ndarray
+
+
+def build_fold_matrices(
+    preprocessor,
+    X,
+    y,
+    splits: Sequence[Tuple[np.ndarray, np.ndarray]],
+    n_jobs: int = -1,
+) -> List[FoldMatrices]:
+    """
+    Fit the preprocessing once per split and transform its train and test rows.
+
+    The preprocessing does not depend on the regressor, so the matrices of a fold
+    are the same for every candidate model: computing them once per fold instead
+    of once per model x fold removes all but one of the fits of the preprocessor.
+
+    Args:
+        preprocessor: The preprocessing step, cloned for every split.
+        X (pd.DataFrame): Features.
+        y (pd.Series): Target.
+        splits (list): (train_index, test_index) positions of each split.
+        n_jobs (int): Number of joblib workers, -1 for all the cores.
+
+    Returns:
+        list: FoldMatrices of each split, in the order of the splits.
+    """
+    return Parallel(n_jobs=n_jobs)(
+        delayed(_transform_split)(clone(preprocessor), X, y, train_index, test_index)
+        for train_index, test_index in splits
+    )
+
+
+def _transform_split(preprocessor, X, y, train_index, test_index):
+    X_train = preprocessor.fit_transform(X.iloc[train_index])
+    return FoldMatrices(
+        preprocessor=preprocessor,
+        X_train=X_train,
+        y_train=y.iloc[train_index].to_numpy(),
+        X_test=preprocessor.transform(X.iloc[test_index]),
+        y_test=y.iloc[test_index].to_numpy(),
+    )
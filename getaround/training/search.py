@@ -0,0 +1,227 @@
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import KFold, train_test_split
+
+from training.experiments import ExperimentResult, evaluate_on_holdout
+from training.fold_cache import FoldMatrices, build_fold_matrices
+
+
+@dataclass
+class Trial:
+    """
+    One hyperparameter configuration of a candidate model.
+
+    Attributes:
+        model_name (str): Name of the candidate model.
+        regressor: The unfitted regressor, with the sampled hyperparameters set.
+        params (dict): The sampled hyperparameters.
+        rung_scores (list): Mean cross-validation score at each rung reached.
+        cv_scores (np.ndarray): Scores of the folds at the last rung reached.
+        fit_seconds (float): Total fitting time of the trial.
+    """
+
+    model_name: str
+    regressor: object
+    params: Dict
+    rung_scores: List[float] = field(default_factory=list)
+    cv_scores: Optional[np.ndarray] = None
+    fit_seconds: float = 0.0
+
+
+def load_search_spaces(path: str, defaults: Dict) -> Dict:
+    """
+    Override the default search spaces with the ones of a JSON file.
+
+    The file maps model names to {hyperparameter: space}, the models it does not
+    mention keep their default space.
+    """
+    with open(path) as file:
+        return {**defaults, **json.load(file)}
+
+
+def sample_trials(
+    models: Dict,
+    search_spaces: Dict,
+    n_candidates: int,
+    random_state: int = 42,
+) -> List[Trial]:
+    """
+    Draw the hyperparameter configurations of each model.
+
+    The configuration of `models` itself is always the first trial of each model,
+    so the search never does worse than the untuned baseline. Models without a
+    search space only get that one.
+
+    Args:
+        models (dict): Regressors by name, with their baseline hyperparameters.
+        search_spaces (dict): {hyperparameter: space} by model name.
+        n_candidates (int): Number of configurations per model, baseline included.
+        random_state (int): Seed of the sampling.
+
+    Returns:
+        list: The trials of all the models.
+    """
+    rng = np.random.default_rng(random_state)
+    trials = []
+    for model_name, model in models.items():
+        space = search_spaces.get(model_name, {})
+        baseline_params = {
+            name: value for name, value in model.get_params().items() if name in space
+        }
+        trials.append(Trial(model_name, clone(model), baseline_params))
+        if not space:
+            continue
+        for _ in range(n_candidates - 1):
+            params = {name: _sample(values, rng) for name, values in space.items()}
+            trials.append(Trial(model_name, clone(model).set_params(**params), params))
+    return trials
+
+
+def successive_halving(
+    models: Dict,
+    preprocessor,
+    X,
+    y,
+    search_spaces: Dict,
+    on_result: Optional[Callable[[ExperimentResult], None]] = None,
+    n_candidates: int = 9,
+    eta: int = 3,
+    min_resources: int = 250,
+    scoring: str = "r2",
+    cv: int = 5,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    n_jobs: int = -1,
+) -> List[ExperimentResult]:
+    """
+    Tune the candidate models with successive halving.
+
+    All the trials of all the models are cross-validated on a small share of the
+    train rows, then only the best `1 / eta` of them go on to the next rung, with
+    `eta` times more rows, until the last rung uses all of them. Weak
+    configurations, and weak models, are thus dropped after a cheap evaluation.
+    The trials of a rung run in parallel, one joblib task per trial x fold, on the
+    design matrices of each fold, computed once for the whole search.
+
+    The surviving trials, those of the last rung, are then fitted on the train
+    split and evaluated on the test split, which is never seen by the search.
+
+    Args:
+        models (dict): Regressors by name, with their baseline hyperparameters.
+        preprocessor: The preprocessing step.
+        X (pd.DataFrame): Features.
+        y (pd.Series): Target.
+        search_spaces (dict): {hyperparameter: space} by model name.
+        on_result (callable, optional): Called with the ExperimentResult of each
+            surviving trial, e.g. to log it to MLflow.
+        n_candidates (int): Number of configurations per model, baseline included.
+        eta (int): Reduction factor of the trials between two rungs.
+        min_resources (int): Minimum number of train rows of a fold at the first rung.
+        scoring (str): Scorer used for the cross-validation.
+        cv (int): Number of cross-validation folds of the train split.
+        test_size (float): Proportion of the test split.
+        random_state (int): Seed of the sampling, the splits and the subsamples.
+        n_jobs (int): Number of joblib workers, -1 for all the cores.
+
+    Returns:
+        list: ExperimentResult of each surviving trial.
+    """
+    trials = sample_trials(models, search_spaces, n_candidates, random_state)
+
+    train_index, test_index = train_test_split(
+        np.arange(len(X)), test_size=test_size, random_state=random_state
+    )
+    folds = [
+        (train_index[fold_train], train_index[fold_test])
+        for fold_train, fold_test in KFold(
+            n_splits=cv, shuffle=True, random_state=random_state
+        ).split(train_index)
+    ]
+    holdout, *fold_matrices = build_fold_matrices(
+        preprocessor, X, y, [(train_index, test_index)] + folds, n_jobs=n_jobs
+    )
+
+    # Same row order at every rung, so the rows of a rung extend those of the last
+    rng = np.random.default_rng(random_state)
+    permutations = [rng.permutation(len(m.y_train)) for m in fold_matrices]
+    max_resources = min(len(m.y_train) for m in fold_matrices)
+
+    # 1 + floor(log_eta(trials)), in integers: math.log(243, 3) is 4.999...
+    n_rungs = 1
+    while eta**n_rungs <= len(trials):
+        n_rungs += 1
+    while n_rungs > 1 and max_resources / eta ** (n_rungs - 1) < min_resources:
+        n_rungs -= 1
+
+    parallel = Parallel(n_jobs=n_jobs)
+    for rung in range(n_rungs):
+        n_rows = int(max_resources / eta ** (n_rungs - 1 - rung))
+        outputs = parallel(
+            delayed(_score_trial)(
+                trial_index, fold, trial.regressor, matrices, rows[:n_rows], scoring
+            )
+            for trial_index, trial in enumerate(trials)
+            for fold, (matrices, rows) in enumerate(zip(fold_matrices, permutations))
+        )
+        scores = np.zeros((len(trials), cv))
+        for trial_index, fold, score, seconds in outputs:
+            scores[trial_index, fold] = score
+            trials[trial_index].fit_seconds += seconds
+        for trial, trial_scores in zip(trials, scores):
+            trial.cv_scores = trial_scores
+            trial.rung_scores.append(float(np.mean(trial_scores)))
+
+        print(
+            f"Rung {rung + 1}/{n_rungs}: {len(trials)} trials on {n_rows} rows, "
+            f"best {max(trial.rung_scores[-1] for trial in trials):.4f}"
+        )
+        if rung < n_rungs - 1:
+            n_kept = max(1, math.ceil(len(trials) / eta))
+            trials = sorted(trials, key=lambda trial: -trial.rung_scores[-1])[:n_kept]
+
+    outputs = parallel(
+        delayed(evaluate_on_holdout)(trial.regressor, holdout) for trial in trials
+    )
+    results = []
+    for trial, (payload, seconds) in zip(trials, outputs):
+        result = ExperimentResult(
+            model_name=trial.model_name,
+            cv_scores=trial.cv_scores,
+            fit_seconds=trial.fit_seconds + seconds,
+            params=trial.params,
+            **payload,
+        )
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    return results
+
+
+def _sample(space, rng: np.random.Generator):
+    if isinstance(space, list):
+        return space[rng.integers(len(space))]
+    low, high = space["low"], space["high"]
+    if space.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if space.get("int"):
+        return int(round(value))
+    return float(value)
+
+
+def _score_trial(trial_index, fold, regressor, matrices: FoldMatrices, rows, scoring):
+    start = time.perf_counter()
+    regressor = clone(regressor)
+    regressor.fit(matrices.X_train[rows], matrices.y_train[rows])
+    score = get_scorer(scoring)(regressor, matrices.X_test, matrices.y_test)
+    return trial_index, fold, score, time.perf_counter() - start
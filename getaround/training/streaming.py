@@ -0,0 +1,169 @@
+import time
+from typing import Dict, Iterator, Set
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.frozen import FrozenEstimator
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from training.candidates import (
+    CATEGORICAL_FEATURES,
+    NUMERIC_FEATURES,
+    RARE_CATEGORY_MIN_FREQUENCY,
+    TARGET,
+    build_preprocessor,
+    prepare_dataset,
+)
+from training.experiments import ExperimentResult
+from training.transformers import LowercaseTransformer, RareCategoryGrouper
+
+
+def read_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Read and prepare the pricing CSV chunk by chunk.
+    """
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield prepare_dataset(chunk)
+
+
+def fit_preprocessor(path: str, chunksize: int) -> ColumnTransformer:
+    """
+    Fit the preprocessing of the candidate models in one pass over the CSV.
+
+    The StandardScaler statistics and the category counts of the
+    RareCategoryGrouper are updated chunk by chunk, along with the vocabulary of
+    each categorical column. The scaler and the grouper are then frozen in the
+    preprocessor of the candidate models, whose one-hot encoding is fitted on the
+    vocabularies only. The memory used depends on the chunk size and on the
+    number of categories, not on the number of rows.
+
+    Args:
+        path (str): The pricing CSV.
+        chunksize (int): Number of rows read at once.
+
+    Returns:
+        ColumnTransformer: The fitted preprocessor, with a sparse output.
+    """
+    scaler = StandardScaler()
+    lowercase = LowercaseTransformer()
+    grouper = RareCategoryGrouper(min_frequency=RARE_CATEGORY_MIN_FREQUENCY)
+    vocabularies: Dict[str, Set] = {column: set() for column in CATEGORICAL_FEATURES}
+    for chunk in read_chunks(path, chunksize):
+        scaler.partial_fit(chunk[NUMERIC_FEATURES])
+        categories = lowercase.transform(chunk[CATEGORICAL_FEATURES])
+        grouper.partial_fit(categories)
+        for column, vocabulary in vocabularies.items():
+            vocabulary.update(categories[column].dropna().unique())
+
+    # Vocabulary of each column after the grouping, unseen values included
+    for column, categories in grouper.categories_.items():
+        vocabularies[column] = set(categories) | {grouper.other}
+
+    # One row per category is enough to fit the one-hot encoding
+    n_rows = max(len(vocabulary) for vocabulary in vocabularies.values())
+    frame = pd.DataFrame(
+        {
+            **{column: np.zeros(n_rows) for column in NUMERIC_FEATURES},
+            **{
+                column: np.resize(np.array(sorted(vocabulary), dtype=object), n_rows)
+                for column, vocabulary in vocabularies.items()
+            },
+        }
+    )
+    # The scaler and the grouper fitted on the whole CSV are kept as they are
+    preprocessor = build_preprocessor().set_params(
+        num=FrozenEstimator(scaler),
+        cat__rare=FrozenEstimator(grouper),
+        sparse_threshold=1.0,
+    )
+    return preprocessor.fit(frame)
+
+
+def train_streaming(
+    path: str,
+    regressor=None,
+    chunksize: int = 100_000,
+    epochs: int = 5,
+    validation_fraction: float = 0.2,
+    random_state: int = 42,
+) -> ExperimentResult:
+    """
+    Train an incremental regressor on a pricing CSV that does not fit in memory.
+
+    After the preprocessing pass, each epoch reads the CSV again, transforms each
+    chunk into a sparse design matrix and updates the regressor with partial_fit.
+    A fixed share of the rows of each chunk is kept aside for the validation,
+    computed in a last pass from running sums.
+
+    Args:
+        path (str): The pricing CSV.
+        regressor: An estimator with partial_fit, SGDRegressor by default.
+        chunksize (int): Number of rows read at once.
+        epochs (int): Number of passes of the regressor over the train rows.
+        validation_fraction (float): Share of the rows kept for the validation.
+        random_state (int): Seed of the validation split and of the shuffling.
+
+    Returns:
+        ExperimentResult: The fitted pipeline and its validation metrics.
+    """
+    start = time.perf_counter()
+    if regressor is None:
+        regressor = SGDRegressor(random_state=random_state)
+    features = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+    preprocessor = fit_preprocessor(path, chunksize)
+
+    def split_chunks(epoch):
+        for index, chunk in enumerate(read_chunks(path, chunksize)):
+            # Same validation rows at every epoch, the train rows are shuffled
+            is_validation = (
+                np.random.default_rng([random_state, index]).random(len(chunk))
+                < validation_fraction
+            )
+            order = np.random.default_rng([random_state, index, epoch]).permutation(
+                np.flatnonzero(~is_validation)
+            )
+            yield (
+                preprocessor.transform(chunk[features]),
+                chunk[TARGET].to_numpy(dtype=np.float64),
+                order,
+                np.flatnonzero(is_validation),
+            )
+
+    for epoch in range(epochs):
+        for X, y, train_rows, _ in split_chunks(epoch):
+            regressor.partial_fit(X[train_rows], y[train_rows])
+
+    # Running sums of the validation errors
+    n, sum_y, sum_y2, sum_squared_errors, sum_absolute_errors = 0, 0.0, 0.0, 0.0, 0.0
+    for X, y, _, validation_rows in split_chunks(epochs):
+        if not len(validation_rows):
+            continue
+        y_true = y[validation_rows]
+        errors = y_true - regressor.predict(X[validation_rows])
+        n += len(y_true)
+        sum_y += y_true.sum()
+        sum_y2 += np.square(y_true).sum()
+        sum_squared_errors += np.square(errors).sum()
+        sum_absolute_errors += np.abs(errors).sum()
+
+    # No validation rows, e.g. with validation_fraction=0: no metrics
+    rmse = mae = r2 = float("nan")
+    if n:
+        rmse = float(np.sqrt(sum_squared_errors / n))
+        mae = float(sum_absolute_errors / n)
+        r2 = float(1 - sum_squared_errors / (sum_y2 - sum_y**2 / n))
+
+    return ExperimentResult(
+        model_name=type(regressor).__name__,
+        pipeline=Pipeline([("preprocessor", preprocessor), ("regressor", regressor)]),
+        rmse=rmse,
+        mae=mae,
+        r2_score=r2,
+        cv_scores=np.empty(0),
+        fit_seconds=time.perf_counter() - start,
+        params={"chunksize": chunksize, "epochs": epochs},
+    )
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class LowercaseTransformer(BaseEstimator, TransformerMixin):
+    """
+    Lower-case the string, object and categorical columns of a frame.
+
+    Each distinct value is lower-cased once: the column is factorized into codes
+    and its few categories, the categories are lower-cased, then taken back by
+    code. Missing values stay missing.
+    """
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        return X.apply(lambda x: lowercase(x) if _is_text(x) else x)
+
+
+def lowercase(column: pd.Series) -> pd.Series:
+    """
+    Lower-case a column of strings through its categories.
+
+    Args:
+        column (pd.Series): An object or category column.
+
+    Returns:
+        pd.Series: The lower-cased values, as objects.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        categories = column.cat.categories
+    else:
+        codes, categories = pd.factorize(column)
+    # One extra slot for the missing values, whose code is -1
+    lowered = np.append(pd.Index(categories).str.lower().to_numpy(dtype=object), np.nan)
+    return pd.Series(
+        lowered.take(codes), index=column.index, name=column.name, dtype=object
+    )
+
+
+def _is_text(column: pd.Series) -> bool:
+    # Object columns, the string dtype of pandas >= 3 and categories
+    return pd.api.types.is_string_dtype(column.dtype) or isinstance(
+        column.dtype, pd.CategoricalDtype
+    )
+
+
+class RareCategoryGrouper(BaseEstimator, TransformerMixin):
+    """
+    Replace the rare categories of some columns by a single "other" category.
+
+    The categories to keep are learned at fit time, or chunk by chunk with
+    partial_fit, those whose share of the rows is above the minimum frequency of
+    their column. As the shares were before this step, they are compared as
+    percentages rounded to 2 decimals: with a minimum of 0.05, a category of
+    5.004% of the rows is grouped. At transform time, any other value, unseen or missing included,
+    becomes `other`, so the same grouping runs when the pipeline is served.
+
+    Args:
+        min_frequency (dict): Minimum share of the rows of a category, by column.
+            The columns not listed are left untouched.
+        other (str): Category replacing the rare ones.
+    """
+
+    def __init__(self, min_frequency=None, other="other"):
+        self.min_frequency = min_frequency
+        self.other = other
+
+    def fit(self, X, y=None):
+        self.counts_ = {}
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        """
+        Update the category counts with a chunk of rows, for out-of-core fitting.
+        """
+        if not hasattr(self, "counts_"):
+            self.counts_ = {}
+        self.categories_ = {}
+        for column, min_frequency in (self.min_frequency or {}).items():
+            counts = X[column].value_counts()
+            if column in self.counts_:
+                counts = counts.add(self.counts_[column], fill_value=0)
+            self.counts_[column] = counts
+            percentages = counts.div(counts.sum()).mul(100).round(2)
+            self.categories_[column] = percentages.index[
+                percentages > round(min_frequency * 100, 2)
+            ]
+        return self
+
+    def transform(self, X, y=None):
+        X = X.copy()
+        for column, categories in self.categories_.items():
+            X[column] = X[column].where(X[column].isin(categories), self.other)
+        return X